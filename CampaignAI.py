@@ -0,0 +1,261 @@
+import copy
+import io
+import os
+import queue
+import random
+import time
+from contextlib import redirect_stdout
+from multiprocessing import Pool
+
+from CampaignAnalytics import GraphAnalytics
+from CampaignCommands import Commands
+from CampaignReplay import apply_order, run_turn
+
+# settings of Commands copied to the detached campaigns so they play by the same rules
+SETTINGS = ('scrapRatio', 'resourceGenerationRatio', 'brachistochroneMassRatio', 'hohmannMassRatio')
+
+# player created to give the orders of a faction nobody plays, like the Neutral planets
+NPC_PLAYER = '{faction} NPC'
+
+# what each kind of ship class is picked for when building
+SHIP_CHOICES = ('cheapest', 'storage', 'heaviest', 'random')
+
+
+class MemoryCampaign(dict):
+    """ Stand in for the campaign shelve that only lives in memory, nothing is ever written to disk """
+
+    def sync(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class MemoryCommands(Commands):
+    """ Commands on a detached in-memory copy of a campaign, for trying orders out without touching the save """
+
+    def __init__(self, snapshot: dict, settings: dict):
+        self.readOnly = False
+        self.campaign = MemoryCampaign(copy.deepcopy(snapshot))
+        for setting, value in settings.items():
+            setattr(self, setting, value)
+        self.listeners = []
+
+
+def random_policy(rng: random.Random):
+    """ Pick a random policy for the orders of a faction
+    :param rng: random generator the policy is drawn from
+    :return: dict of how much to build, what to build, how much of it to send out and how to move it
+    """
+    return {'build': rng.uniform(0.2, 1.0), 'ship': rng.choice(SHIP_CHOICES), 'fleetShare': rng.uniform(0.0, 1.0),
+            'fuel': rng.uniform(0.2, 1.0), 'transfer': rng.choice(('hohmann', 'brachistochrone')),
+            'seed': rng.randrange(2 ** 32)}
+
+
+def pick_ship(shipClasses: dict, choice: str, rng: random.Random):
+    if choice == 'cheapest':
+        return min(shipClasses, key=lambda ship: (shipClasses[ship]['points'], ship))
+    if choice == 'storage':
+        return max(shipClasses, key=lambda ship: (shipClasses[ship]['resStorage'] / shipClasses[ship]['points'], ship))
+    if choice == 'heaviest':
+        return max(shipClasses, key=lambda ship: (shipClasses[ship]['mass'] / shipClasses[ship]['points'], ship))
+    return rng.choice(sorted(shipClasses))
+
+
+def policy_orders(engine: Commands, faction: str, policy: dict, rng: random.Random, analytics: GraphAnalytics):
+    """ Work out the orders a policy gives this turn for every player of a faction, running each one on the
+    engine as it goes so later orders see what the earlier ones did
+    :param engine: campaign the orders are worked out on, it is changed by the orders
+    :param faction: faction the orders are for
+    :param policy: dict from random_policy
+    :param rng: random generator for the choices left to chance
+    :param analytics: graph analytics following the engine
+    :return: list of orders, tuples of the method name and a tuple of its arguments
+    """
+    orders = []
+
+    def order(method, *args):
+        orders.append((method, args))
+        apply_order(engine, (method, args))
+
+    campaign = engine.campaign
+    planets = campaign['planets']
+    players = sorted(player for player, localPlayer in campaign['players'].items()
+                     if localPlayer['faction'] == faction)
+    shipClasses = campaign['ships']
+    distances = analytics.distance_to_enemy(faction)
+
+    for player in players:
+        # build on the planets the faction controls
+        if shipClasses:
+            ship = pick_ship(shipClasses, policy['ship'], rng)
+            for planet in sorted(planets):
+                localPlanet = planets[planet]
+                if localPlanet['factionControl'] != faction:
+                    continue
+                amount = int(localPlanet['resources'][player] * policy['build'] // shipClasses[ship]['points'])
+                if amount > 0:
+                    order('make_ship', planet, player, ship, amount)
+
+        # send a share of the idle ships out as fleets
+        fleetNames = {fleet for localPlanet in planets.values() for fleet in localPlanet['fleets'][player]}
+        fleetNames |= set(campaign['players'][player]['transits'])
+        for planet in sorted(planets):
+            localShips = planets[planet]['ships'][player]
+            ships = {ship: int(amount * policy['fleetShare']) for ship, amount in localShips.items()}
+            ships = {ship: amount for ship, amount in ships.items() if amount > 0}
+            if not ships:
+                continue
+            number = len(fleetNames)
+            while f'{faction} {number}' in fleetNames:
+                number += 1
+            fleetNames.add(f'{faction} {number}')
+            order('make_fleet', planet, player, f'{faction} {number}', ships)
+
+        # fuel the fleets and move them one planet closer to the enemy
+        for planet in sorted(planets):
+            localPlanet = planets[planet]
+            for fleet in sorted(localPlanet['fleets'][player]):
+                if planet not in distances or distances[planet] == 0:
+                    continue
+                planetTo = min(localPlanet['connections'], key=lambda neighbour: (
+                    distances.get(neighbour, float('inf')) + localPlanet['connections'][neighbour], neighbour))
+                localFleet = localPlanet['fleets'][player][fleet]
+                stats = engine.calculate_fleet_stats(localFleet)
+                space = stats['fleetStorage'] - localFleet['resources']
+                fuel = int(min(localPlanet['resources'][player] * policy['fuel'], space))
+                if fuel > 0:
+                    order('transfer_resources', planet, fuel, player, planet, player, fleet)
+
+                ratio = engine.hohmannMassRatio if policy['transfer'] == 'hohmann' else engine.brachistochroneMassRatio
+                if stats['fleetMass'] / ratio * localPlanet['connections'][planetTo] <= localFleet['resources']:
+                    order(f"{policy['transfer']}_fleet_transfer", player, fleet, planet, planetTo)
+    return orders
+
+
+def score(engine: Commands, faction: str, analytics: GraphAnalytics):
+    """ Score how well a faction is doing: what it holds, and how close to the enemy its ships are
+    :param engine: campaign to score
+    :param faction: faction to score
+    :param analytics: graph analytics following the engine
+    :return: score, higher is better
+    """
+    campaign = engine.campaign
+    planets = campaign['planets']
+    shipClasses = campaign['ships']
+    distances = analytics.distance_to_enemy(faction)
+    total = 0.0
+
+    def worth(ships):
+        return sum(shipClasses[ship]['points'] * amount for ship, amount in ships.items())
+
+    for player, localPlayer in campaign['players'].items():
+        if localPlayer['faction'] != faction:
+            continue
+        for planet, localPlanet in planets.items():
+            # ships closer to enemy territory count for more, with the value of the planet they are on
+            position = 1 + localPlanet['value'] / 1000 / (1 + distances.get(planet, len(planets)))
+            total += localPlanet['resources'][player]
+            total += worth(localPlanet['production'][player])
+            total += worth(localPlanet['ships'][player]) * position
+            for localFleet in localPlanet['fleets'][player].values():
+                total += localFleet['resources'] + worth(localFleet['ships']) * position
+        for transit in localPlayer['transits'].values():
+            total += transit['fleet']['resources'] + worth(transit['fleet']['ships'])
+    return total
+
+
+# the campaign every candidate starts from, sent to each worker process once rather than with every candidate
+workerState = {}
+
+
+def init_worker(snapshot: dict, settings: dict):
+    workerState['snapshot'] = snapshot
+    workerState['settings'] = settings
+
+
+def evaluate(faction: str, policy: dict, turns: int):
+    """ Play a policy a few turns ahead on a detached copy of the campaign
+    :return: tuple of the score reached and the orders the policy gives this turn
+    """
+    engine = MemoryCommands(workerState['snapshot'], workerState['settings'])
+    # one analytics for the whole look ahead, it keeps up with control changes through its listener
+    analytics = GraphAnalytics(engine)
+    rng = random.Random(policy['seed'])
+    with redirect_stdout(io.StringIO()):
+        firstOrders = policy_orders(engine, faction, policy, rng, analytics)
+        run_turn(engine, ('end_turn', ()))
+        for _ in range(turns - 1):
+            policy_orders(engine, faction, policy, rng, analytics)
+            run_turn(engine, ('end_turn', ()))
+    return score(engine, faction, analytics), firstOrders
+
+
+def generate_ai_orders(campaign: Commands, faction: str, candidates: int = 32, turns: int = 3,
+                       budget: float = 5.0, processes: int = None, seed: int = None):
+    """ Generate this turn's orders for every player of a faction by playing random policies a few turns ahead
+    in parallel and keeping the orders of the best one
+    :param campaign: campaign to generate orders for, it is not changed
+    :param faction: faction the orders are for
+    :param candidates: number of policies tried
+    :param turns: number of turns each policy is played ahead
+    :param budget: seconds to spend, policies that haven't finished by then are dropped and their workers stopped
+    :param processes: number of worker processes, defaults to the number of CPUs
+    :param seed: random seed, the same seed on the same campaign always tries the same policies
+    :return: dict with the orders, their score and the number of policies scored. For a faction without players
+             the orders start by adding its NPC player, who has nothing to give orders with until the next turn
+    :raises ValueError: if the faction has no players and controls no planets
+    """
+    start = time.perf_counter()
+    snapshot = campaign.snapshot()
+    settings = {setting: getattr(campaign, setting) for setting in SETTINGS}
+
+    setup = []
+    if not any(localPlayer['faction'] == faction for localPlayer in snapshot['players'].values()):
+        if not any(localPlanet['factionControl'] == faction for localPlanet in snapshot['planets'].values()):
+            raise ValueError(f'Faction {faction} has no players and controls no planets, there is nothing to order')
+        setup = [('add_player', (NPC_PLAYER.format(faction=faction), faction))]
+        engine = MemoryCommands(snapshot, settings)
+        with redirect_stdout(io.StringIO()):
+            apply_order(engine, setup[0])
+        snapshot = engine.snapshot()
+    rng = random.Random(seed)
+    policies = [random_policy(rng) for _ in range(candidates)]
+
+    # results (or the errors raised playing them) come back in the order the policies finish
+    results = queue.SimpleQueue()
+    pool = Pool(processes or os.cpu_count(), init_worker, (snapshot, settings))
+    best = None
+    scored = 0
+    try:
+        for policy in policies:
+            pool.apply_async(evaluate, (faction, policy, turns), callback=results.put, error_callback=results.put)
+
+        # while the workers play, work out the first policy's orders without looking ahead, to fall back on if
+        # nothing finishes in time
+        engine = MemoryCommands(snapshot, settings)
+        with redirect_stdout(io.StringIO()):
+            fallback = None, policy_orders(engine, faction, policies[0], random.Random(policies[0]['seed']),
+                                           GraphAnalytics(engine))
+
+        while scored < candidates:
+            remaining = budget - (time.perf_counter() - start)
+            if remaining <= 0:
+                break
+            try:
+                result = results.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if isinstance(result, BaseException):
+                raise result
+            scored += 1
+            if best is None or result[0] > best[0]:
+                best = result
+    finally:
+        # stop the policies still being played, so they don't keep the CPUs busy after the budget
+        pool.terminate()
+        pool.join()
+
+    if best is None:
+        best = fallback
+    return {'orders': setup + best[1], 'score': best[0], 'scored': scored, 'candidates': candidates}
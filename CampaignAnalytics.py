@@ -0,0 +1,213 @@
+import heapq
+
+from CampaignCommands import Commands
+
+# planets controlled by this faction are not counted as enemy territory of anyone
+NEUTRAL = 'Neutral'
+
+
+class GraphAnalytics:
+    """ Strategic analytics over the connection graph of a campaign: chokepoints (articulation points),
+    betweenness centrality, frontier planets and distance to enemy territory. Results are cached, the ones
+    that only depend on the map are kept until a connection or planet is added, and the ones that depend on
+    who controls what are kept until control of a planet changes.
+    """
+
+    def __init__(self, campaign: Commands):
+        self.campaign = campaign
+        # planet -> {connected planet: distance}
+        self.graph = {}
+        # planet -> faction controlling it
+        self.control = {}
+        # results that only depend on the connections
+        self.topologyCache = {}
+        # results that also depend on planet control, by (analysis, faction)
+        self.controlCache = {}
+        self.rebuild()
+        campaign.add_listener(self.handle_event)
+
+    def rebuild(self):
+        """ Read the map again and forget every cached result
+        :return: None
+        """
+        planets = self.campaign.campaign.get('planets', {})
+        self.graph = {planet: {} for planet in planets}
+        for planet, localPlanet in planets.items():
+            for neighbour, distance in localPlanet['connections'].items():
+                # a mistyped add_connection leaves a connection to a planet that doesn't exist, and a one way one
+                # if the planet is added later, so only connections between existing planets are kept, both ways
+                if neighbour in self.graph:
+                    self.graph[planet][neighbour] = distance
+                    self.graph[neighbour][planet] = distance
+        self.control = {planet: localPlanet['factionControl'] for planet, localPlanet in planets.items()}
+        self.topologyCache = {}
+        self.controlCache = {}
+
+    def handle_event(self, event: str, details: dict):
+        """ Update the graph from a campaign change notification and drop the results it invalidates
+        :param event: name of the event
+        :param details: dict of the event details
+        :return: None
+        """
+        if event == 'connection_added':
+            self.graph[details['planet1']][details['planet2']] = details['distance']
+            self.graph[details['planet2']][details['planet1']] = details['distance']
+            self.topologyCache = {}
+            self.controlCache = {}
+        elif event == 'control_changed':
+            if self.control.get(details['planet']) != details['faction']:
+                self.control[details['planet']] = details['faction']
+                self.controlCache = {}
+        elif event in ('planet_added', 'campaign_loaded'):
+            # a re-added planet loses its connections, so read the whole map again
+            self.rebuild()
+
+    def close(self):
+        """ Stop following the campaign
+        :return: None
+        """
+        self.campaign.remove_listener(self.handle_event)
+
+    def articulation_points(self):
+        """ Find the chokepoints of the map, the planets that split it apart if they are taken out
+        :return: set of planet names
+        """
+        if 'articulation' not in self.topologyCache:
+            self.topologyCache['articulation'] = self.find_articulation_points()
+        return self.topologyCache['articulation']
+
+    def find_articulation_points(self):
+        # Tarjan's algorithm with an explicit stack, large generated maps are deeper than the recursion limit
+        order = {}
+        low = {}
+        points = set()
+        for root in self.graph:
+            if root in order:
+                continue
+            order[root] = low[root] = len(order)
+            rootChildren = 0
+            stack = [(root, None, iter(self.graph[root]))]
+            while stack:
+                planet, parent, neighbours = stack[-1]
+                for neighbour in neighbours:
+                    if neighbour == parent:
+                        continue
+                    if neighbour in order:
+                        low[planet] = min(low[planet], order[neighbour])
+                    else:
+                        order[neighbour] = low[neighbour] = len(order)
+                        stack.append((neighbour, planet, iter(self.graph[neighbour])))
+                        break
+                else:
+                    stack.pop()
+                    if parent is None:
+                        continue
+                    low[parent] = min(low[parent], low[planet])
+                    if parent == root:
+                        rootChildren += 1
+                    elif low[planet] >= order[parent]:
+                        points.add(parent)
+            if rootChildren > 1:
+                points.add(root)
+        return points
+
+    def betweenness(self):
+        """ Get the betweenness centrality of every planet, the share of shortest routes (by distance)
+        between other planets that go through it
+        :return: dict of planet names to their centrality between 0 and 1
+        """
+        if 'betweenness' not in self.topologyCache:
+            self.topologyCache['betweenness'] = self.find_betweenness()
+        return self.topologyCache['betweenness']
+
+    def find_betweenness(self):
+        # Brandes' algorithm with Dijkstra for the weighted shortest routes
+        centrality = dict.fromkeys(self.graph, 0.0)
+        for source in self.graph:
+            visited = []
+            predecessors = {planet: [] for planet in self.graph}
+            routes = dict.fromkeys(self.graph, 0)
+            routes[source] = 1
+            distances = {source: 0}
+            queue = [(0, source)]
+            done = set()
+            while queue:
+                distance, planet = heapq.heappop(queue)
+                if planet in done:
+                    continue
+                done.add(planet)
+                visited.append(planet)
+                for neighbour, length in self.graph[planet].items():
+                    newDistance = distance + length
+                    if neighbour not in distances or newDistance < distances[neighbour]:
+                        distances[neighbour] = newDistance
+                        routes[neighbour] = routes[planet]
+                        predecessors[neighbour] = [planet]
+                        heapq.heappush(queue, (newDistance, neighbour))
+                    elif newDistance == distances[neighbour]:
+                        routes[neighbour] += routes[planet]
+                        predecessors[neighbour].append(planet)
+
+            dependency = dict.fromkeys(visited, 0.0)
+            for planet in reversed(visited):
+                for predecessor in predecessors[planet]:
+                    dependency[predecessor] += routes[predecessor] / routes[planet] * (1 + dependency[planet])
+                if planet != source:
+                    centrality[planet] += dependency[planet]
+
+        # every route was counted from both ends
+        pairs = (len(self.graph) - 1) * (len(self.graph) - 2)
+        return {planet: value / pairs if pairs else 0.0 for planet, value in centrality.items()}
+
+    def frontier(self, faction: str = None):
+        """ Find the front lines, the planets connected to a planet controlled by another faction
+        :param faction: only planets controlled by this faction, None for the planets of every faction
+        :return: set of planet names
+        """
+        key = ('frontier', faction)
+        if key not in self.controlCache:
+            self.controlCache[key] = {planet for planet, connections in self.graph.items()
+                                      if (faction is None or self.control[planet] == faction) and
+                                      any(self.control[neighbour] != self.control[planet]
+                                          for neighbour in connections)}
+        return self.controlCache[key]
+
+    def distance_to_enemy(self, faction: str):
+        """ Get how far every planet is from the nearest planet controlled by an enemy of a faction
+        (anyone but the faction itself and the neutrals)
+        :param faction: name of the faction
+        :return: dict of planet names to the distance, planets that can't reach enemy territory are left out
+        """
+        key = ('distance', faction)
+        if key not in self.controlCache:
+            enemies = [planet for planet, control in self.control.items() if control not in (faction, NEUTRAL)]
+            self.controlCache[key] = self.distances_from(enemies)
+        return self.controlCache[key]
+
+    def distances_from(self, sources):
+        # Dijkstra from every source at once
+        distances = {}
+        queue = [(0, planet) for planet in sources]
+        heapq.heapify(queue)
+        while queue:
+            distance, planet = heapq.heappop(queue)
+            if planet in distances:
+                continue
+            distances[planet] = distance
+            for neighbour, length in self.graph[planet].items():
+                if neighbour not in distances:
+                    heapq.heappush(queue, (distance + length, neighbour))
+        return distances
+
+    def summary(self, faction: str = None):
+        """ Get every analysis of the map in one dict, for the shell and reports
+        :param faction: faction to work out the front and distances to enemy territory for, None for all fronts
+        :return: dict of the chokepoints, betweenness, frontier and (for a faction) distances to the enemy
+        """
+        summary = {'chokepoints': sorted(self.articulation_points()),
+                   'betweenness': dict(sorted(self.betweenness().items(), key=lambda item: -item[1])),
+                   'frontier': sorted(self.frontier(faction))}
+        if faction is not None:
+            summary['distanceToEnemy'] = dict(sorted(self.distance_to_enemy(faction).items(),
+                                                     key=lambda item: item[1]))
+        return summary
@@ -0,0 +1,190 @@
+from CampaignCommands import Commands
+
+# the quantities that are audited: resources held (on planets, in fleets and in transit),
+# ships held (on planets, in fleets and in transit) and ships queued for production
+KINDS = ('resources', 'ships', 'queued')
+
+# differences smaller than this are rounding from the scrap ratio and fuel costs
+TOLERANCE = 1e-6
+
+
+class Auditor:
+    """ Keeps conservation ledgers of resources and ships from the change notifications of a campaign.
+    Every notification says what should have entered or left the game, and only the planets and transits
+    it touched are recounted, so checking for drift costs as much as the changes since the last check.
+    """
+
+    def __init__(self, campaign: Commands):
+        self.campaign = campaign
+        # what should be held according to the notifications
+        self.expected = dict.fromkeys(KINDS, 0)
+        # totals of everything that entered or left the game by (kind, reason)
+        self.flows = {}
+        # last count of every location, ('planet', planet, player) or ('transits', player)
+        self.measured = {}
+        # sum of self.measured
+        self.actual = dict.fromkeys(KINDS, 0)
+        # locations changed since the last check
+        self.touched = set()
+        # every drift found so far
+        self.drifts = []
+        self.rebuild()
+        campaign.add_listener(self.handle_event)
+
+    def rebuild(self):
+        """ Recount every location and take the result as the new baseline of the ledgers
+        :return: None
+        """
+        self.measured = {location: self.measure(location) for location in self.all_locations()}
+        self.actual = self.total(self.measured.values())
+        self.expected = dict(self.actual)
+        self.touched = set()
+
+    def all_locations(self):
+        campaign = self.campaign.campaign
+        players = campaign.get('players', {})
+        for planet in campaign.get('planets', {}):
+            for player in players:
+                yield 'planet', planet, player
+        for player in players:
+            yield 'transits', player
+
+    def measure(self, location: tuple):
+        """ Count the resources, ships and queued ships at a location
+        :param location: ('planet', planet, player) or ('transits', player)
+        :return: tuple in the order of KINDS
+        """
+        campaign = self.campaign.campaign
+        resources = ships = queued = 0
+        if location[0] == 'planet':
+            _, planet, player = location
+            localPlanet = campaign['planets'].get(planet)
+            if localPlanet is None:
+                return 0, 0, 0
+            resources += localPlanet['resources'].get(player, 0)
+            ships += sum(localPlanet['ships'].get(player, {}).values())
+            queued += sum(localPlanet['production'].get(player, {}).values())
+            fleets = localPlanet['fleets'].get(player, {}).values()
+        else:
+            _, player = location
+            localPlayer = campaign['players'].get(player)
+            if localPlayer is None:
+                return 0, 0, 0
+            fleets = [transit['fleet'] for transit in localPlayer['transits'].values()]
+
+        for localFleet in fleets:
+            resources += localFleet['resources']
+            ships += sum(localFleet['ships'].values())
+        return resources, ships, queued
+
+    @staticmethod
+    def total(counts):
+        totals = dict.fromkeys(KINDS, 0)
+        for count in counts:
+            for kind, amount in zip(KINDS, count):
+                totals[kind] += amount
+        return totals
+
+    def record(self, kind: str, amount, reason: str):
+        self.expected[kind] += amount
+        self.flows[(kind, reason)] = self.flows.get((kind, reason), 0) + amount
+
+    def handle_event(self, event: str, details: dict):
+        """ Update the ledgers from a campaign change notification
+        :param event: name of the event
+        :param details: dict of the event details
+        :return: None
+        """
+        if event == 'resources_changed':
+            # transfers only move resources around, everything else enters or leaves the game
+            if details['reason'] != 'transfer':
+                self.record('resources', details['amount'], details['reason'])
+        elif event == 'ships_changed':
+            # ships moved between a planet and a fleet stay in the game
+            if details['reason'] != 'transfer':
+                self.record('ships', details['amount'], details['reason'])
+            if details['reason'] == 'built':
+                self.record('queued', -details['amount'], 'built')
+        elif event == 'production_queued':
+            self.record('queued', details['amount'], 'queued')
+            self.record('resources', -details['cost'], 'production')
+        elif event == 'planet_added':
+            # re-adding a planet replaces everything that was on it
+            for player in self.campaign.campaign['players']:
+                self.touched.add(('planet', details['planet'], player))
+            return
+        elif event == 'campaign_loaded':
+            self.rebuild()
+            return
+        elif event == 'turn_started':
+            self.check()
+            return
+
+        # mark the locations the event changed for the next check
+        player = details.get('player')
+        if player is None:
+            return
+        if details.get('planet') is not None:
+            self.touched.add(('planet', details['planet'], player))
+        if details.get('planet') is None or event in ('fleet_departed', 'fleet_arrived', 'fleet_turned'):
+            self.touched.add(('transits', player))
+
+    def compare(self):
+        drift = {}
+        for kind in KINDS:
+            difference = self.actual[kind] - self.expected[kind]
+            if abs(difference) > TOLERANCE:
+                drift[kind] = difference
+        return drift
+
+    def report(self, drift: dict, locations):
+        if drift:
+            self.drifts.append({'turn': self.campaign.campaign.get('turn'), 'drift': drift,
+                                'locations': sorted(locations, key=str)})
+            for kind, difference in drift.items():
+                print(f"Audit: {abs(difference)} {kind} {'created' if difference > 0 else 'destroyed'} "
+                      f"without a record")
+            # accept the drift so it is only reported once
+            self.expected = dict(self.actual)
+        else:
+            print('Audit: no drift found')
+
+    def check(self):
+        """ Recount only the locations changed since the last check and flag any drift from the ledgers
+        :return: dict of the drift of each kind, empty if there is none
+        """
+        for location in self.touched:
+            count = self.measure(location)
+            previous = self.measured.get(location, (0, 0, 0))
+            for kind, new, old in zip(KINDS, count, previous):
+                self.actual[kind] += new - old
+            self.measured[location] = count
+        locations = self.touched
+        self.touched = set()
+
+        drift = self.compare()
+        self.report(drift, locations)
+        return drift
+
+    def full_check(self):
+        """ Recount every location and flag any drift from the ledgers
+        :return: dict of the drift of each kind, empty if there is none
+        """
+        self.touched = set()
+        measured = {location: self.measure(location) for location in self.all_locations()}
+        locations = [location for location, count in measured.items() if self.measured.get(location) != count]
+        self.measured = measured
+        self.actual = self.total(measured.values())
+
+        drift = self.compare()
+        self.report(drift, locations)
+        return drift
+
+    def ledger(self):
+        """ Get the conservation ledger of every audited kind
+        :return: dict of kind -> {'held', 'in', 'out'} where in and out are totals by reason
+        """
+        ledger = {kind: {'held': self.actual[kind], 'in': {}, 'out': {}} for kind in KINDS}
+        for (kind, reason), amount in self.flows.items():
+            ledger[kind]['in' if amount >= 0 else 'out'][reason] = abs(amount)
+        return ledger
@@ -1,30 +1,187 @@
 import atexit
+import copy
+import dbm
+import os
 import shelve
+import weakref
 
+# version of the layout of the dicts in a save, saves from before it was recorded are version 0.
+# Bump it with a migration in CampaignCompact whenever the layout changes
+SCHEMA_VERSION = 1
+
+# files a dbm save can be spread over, depending on which dbm module wrote it
+SAVE_SUFFIXES = ('', '.db', '.dat', '.dir', '.bak', '.pag')
+
+
+def find_battles(planets: dict, players: dict):
+    """ Find every planet with ships or fleets of more than one faction on it
+    :param planets: the planets dict of a campaign
+    :param players: the players dict of a campaign
+    :return: dict of planet names to {faction: {ship: amount}} for each planet with a battle
+    """
+    battles = {}
+    for planet, localPlanet in planets.items():
+        factionsOnPlanet = {}
+        for player in players:
+            faction = players[player]['faction']
+
+            for ship, shipAmount in localPlanet['ships'][player].items():
+                factionShips = factionsOnPlanet.setdefault(faction, {})
+                factionShips[ship] = factionShips.get(ship, 0) + shipAmount
+
+            for localFleet in localPlanet['fleets'][player].values():
+                for ship, shipAmount in localFleet['ships'].items():
+                    factionShips = factionsOnPlanet.setdefault(faction, {})
+                    factionShips[ship] = factionShips.get(ship, 0) + shipAmount
+
+        if len(factionsOnPlanet) > 1:
+            battles[planet] = factionsOnPlanet
+    return battles
+
+
+# every Commands that has a save open for writing, closed at exit. Held weakly so a campaign
+# that is dropped (by a CampaignManager evicting it) is not kept alive until the program ends
+openCommands = weakref.WeakSet()
 
-class Commands:
+
+@atexit.register
+def close_open_commands():
+    for commands in list(openCommands):
+        commands.campaign.close()
+
+
+class ReadOnlyCampaign:
+    """ Read-only stand in for the campaign shelve that only loads an entry (planets, players, ships, turn)
+    the first time a query touches it. The save is only opened for as long as it takes to read the entry,
+    so any number of readers can use the same save while the GM keeps editing it. If the GM wrote the save
+    since the entries already loaded were read, they are read again with the new one so they always come
+    from the same save.
+    """
 
     def __init__(self, file: str):
-        campaign = shelve.open(file, writeback=True)
-        self.campaign = campaign
+        self.file = file
+        self.cache = {}
+        # state of the save files when the cached entries were read
+        self.stamp = None
+
+    def open_shelve(self):
+        # gdbm locks the file for readers too unless told not to
+        flag = 'ru' if dbm.whichdb(self.file) == 'dbm.gnu' else 'r'
+        return shelve.open(self.file, flag=flag)
+
+    def save_stamp(self):
+        stamp = []
+        for suffix in SAVE_SUFFIXES:
+            if os.path.isfile(self.file + suffix):
+                stats = os.stat(self.file + suffix)
+                stamp.append((suffix, stats.st_mtime_ns, stats.st_size))
+        return tuple(stamp)
+
+    def __getitem__(self, key):
+        if key not in self.cache:
+            while True:
+                stamp = self.save_stamp()
+                keys = [key] if stamp == self.stamp else [key] + list(self.cache)
+                entries = {}
+                with self.open_shelve() as shelf:
+                    for entryKey in keys:
+                        entries[entryKey] = shelf[entryKey]
+                # if the GM wrote the save while it was being read, read it again
+                if self.save_stamp() == stamp:
+                    break
+            self.cache.update(entries)
+            self.stamp = stamp
+        return self.cache[key]
+
+    def __setitem__(self, key, value):
+        raise TypeError('Campaign is opened read-only')
+
+    def __contains__(self, key):
+        if key in self.cache:
+            return True
+        with self.open_shelve() as shelf:
+            return key in shelf
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def refresh(self):
+        """ Forget everything loaded so far so the next queries see the last save the GM wrote
+        :return: None
+        """
+        self.cache.clear()
+        self.stamp = None
+
+    def sync(self):
+        pass
+
+    def close(self):
+        self.cache.clear()
+        self.stamp = None
+
+
+class Commands:
+
+    def __init__(self, file: str, readOnly: bool = False):
+        self.readOnly = readOnly
+        if readOnly:
+            # nothing is written back, so there is no writeback cache and nothing to close at exit
+            self.campaign = ReadOnlyCampaign(file)
+        else:
+            self.campaign = shelve.open(file, writeback=True)
         self.scrapRatio = 0.5
         self.resourceGenerationRatio = 10
         self.brachistochroneMassRatio = 15
         self.hohmannMassRatio = 30
+        # callables notified with (event, details) after every change to the campaign
+        self.listeners = []
 
-        def exit_close():
-            campaign.close()
-
-        atexit.register(exit_close)
+        if not readOnly:
+            openCommands.add(self)
 
     def open_campaign(self, file: str):
-        self.campaign = shelve.open(file, writeback=True)
+        # write out and close the save that was open before
+        self.campaign.close()
+        if self.readOnly:
+            self.campaign = ReadOnlyCampaign(file)
+        else:
+            self.campaign = shelve.open(file, writeback=True)
+            openCommands.add(self)
+        self.notify('campaign_loaded')
+
+    def add_listener(self, listener):
+        """ Register a callable to be notified of every change made to the campaign
+        :param listener: callable taking the event name and a dict of the event details
+        :return: None
+        """
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """ Stop notifying a listener registered with add_listener
+        :param listener: the registered callable
+        :return: None
+        """
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def notify(self, event: str, **details):
+        """ Notify all listeners of a change to the campaign
+        :param event: name of the event (planet_added, ships_changed, fleet_arrived, ect...)
+        :param details: names of the planets, players, fleets and ships involved
+        :return: None
+        """
+        for listener in self.listeners:
+            listener(event, details)
 
     def close_campaign(self):
         """ Writes and closes campaign shelve.
         :return: None
         """
         self.campaign.close()
+        openCommands.discard(self)
 
     def init_campaign(self):
         """ Initializes a campaign by adding the base dicts
@@ -34,6 +191,8 @@ class Commands:
         # Add the dicts if they do not exist, don't overwrite if there is already data
         if 'planets' not in self.campaign:
             self.campaign['planets'] = {}
+            # only a new save is known to have the current layout
+            self.campaign['schemaVersion'] = SCHEMA_VERSION
         if 'players' not in self.campaign:
             self.campaign['players'] = {}
         if 'ships' not in self.campaign:
@@ -51,18 +210,24 @@ class Commands:
         """
 
         # add the planet to the dict
-        self.campaign['planets'][planet] = {}
-        localPlanet = self.campaign['planets'][planet]
+        self.campaign['planets'][planet] = self.new_planet(value, factionControl, factionAllegiance)
+
+        # return a message for the added planet
+        print(f"Planet {planet} added")
+        self.notify('planet_added', planet=planet, value=value, factionControl=factionControl,
+                    factionAllegiance=factionAllegiance)
+
+    def new_planet(self, value: int, factionControl: str, factionAllegiance: str):
+        """ Build the dict for a planet with starting vars for every player currently in the campaign
+        :param value: value stat of the planet
+        :param factionControl: faction that currently controls this planet
+        :param factionAllegiance: faction that the planet is aligned to
+        :return: dict of the planet
+        """
 
         # assign the value stat, factions, connections, and dicts to the planet
-        localPlanet['value'] = value
-        localPlanet['factionControl'] = factionControl
-        localPlanet['factionAllegiance'] = factionAllegiance
-        localPlanet['connections'] = {}
-        localPlanet['resources'] = {}
-        localPlanet['ships'] = {}
-        localPlanet['fleets'] = {}
-        localPlanet['production'] = {}
+        localPlanet = {'value': value, 'factionControl': factionControl, 'factionAllegiance': factionAllegiance,
+                       'connections': {}, 'resources': {}, 'ships': {}, 'fleets': {}, 'production': {}}
 
         # assign all the starting vars for the player
         for player in self.campaign['players']:
@@ -71,8 +236,7 @@ class Commands:
             localPlanet['fleets'][player] = {}
             localPlanet['production'][player] = {}
 
-        # return a message for the added planet
-        print(f"Planet {planet} added")
+        return localPlanet
 
     def add_connection(self, planet1: str, planet2: str, distance: int):
         """ Add a connection from a planet to another
@@ -89,11 +253,29 @@ class Commands:
             self.campaign['planets'][planet2]['connections'][planet1] = distance
             # return a message for the added connections
             print(f"Travel connection from {planet1} to {planet2} of distance {distance} added")
+            self.notify('connection_added', planet1=planet1, planet2=planet2, distance=distance)
         # if there was a KeyError then some planet does not exist
         except KeyError:
             # therefore return a message informing that a planet does not exist
             print('One or both planets does not exist, did you misspell anything?')
 
+    def set_planet_control(self, planet: str, factionControl: str):
+        """ Change the faction that controls a planet, when it is taken or lost
+        :param planet: name of planet
+        :param factionControl: faction that now controls the planet
+        :return: None
+        """
+
+        if planet not in self.campaign['planets']:
+            print('Planet does not exist, did you misspell anything?')
+            return
+
+        localPlanet = self.campaign['planets'][planet]
+        previous = localPlanet['factionControl']
+        localPlanet['factionControl'] = factionControl
+        print(f"Planet {planet} is now controlled by {factionControl}")
+        self.notify('control_changed', planet=planet, faction=factionControl, previous=previous)
+
     def add_player(self, player: str, faction: str):
         """ Add a player to the campaign
         :param player: name of player
@@ -120,6 +302,7 @@ class Commands:
 
         # return a message for the added player
         print(f"Player {player} added")
+        self.notify('player_added', player=player, faction=faction)
 
     def add_ship_to_campaign(self, ship: str, points: int, resStorage: int, mass: int):
         """ Add a ship to the campaign database
@@ -133,6 +316,77 @@ class Commands:
         self.campaign['ships'][ship] = {'points': points, 'resStorage': resStorage, 'mass': mass}
         # return a message for the added ship to the database
         print(f"Ship {ship} added to the campaign database")
+        self.notify('ship_registered', ship=ship, points=points, resStorage=resStorage, mass=mass)
+
+    def bulk_load(self, planets=(), connections=(), players=(), ships=()):
+        """ Add planets, connections, players and ships in one pass and write them to the shelve in one commit
+        :param planets: iterable of (planet, value, factionControl, factionAllegiance)
+        :param connections: iterable of (planet1, planet2, distance)
+        :param players: iterable of (player, faction)
+        :param ships: iterable of (ship, points, resStorage, mass)
+        :return: dict of how many of each were added
+        """
+        self.init_campaign()
+        allPlanets = self.campaign['planets']
+        allPlayers = self.campaign['players']
+        allShips = self.campaign['ships']
+        counts = {'planets': 0, 'connections': 0, 'players': 0, 'ships': 0, 'skipped': 0}
+
+        # read every record before changing anything, so a bad record (a ValueError from CampaignImport)
+        # leaves the campaign as it was instead of half imported in the writeback cache
+        newPlayers = {}
+        for player, faction in players:
+            if player not in allPlayers and player not in newPlayers:
+                newPlayers[player] = faction
+            counts['players'] += 1
+        newPlanets = {}
+        for planet, value, factionControl, factionAllegiance in planets:
+            newPlanets[planet] = (value, factionControl, factionAllegiance)
+            counts['planets'] += 1
+        # connections can only be added once both planets exist, skip the ones that don't
+        newConnections = []
+        for planet1, planet2, distance in connections:
+            if (planet1 in allPlanets or planet1 in newPlanets) and (planet2 in allPlanets or planet2 in newPlanets):
+                newConnections.append((planet1, planet2, distance))
+                counts['connections'] += 1
+            else:
+                counts['skipped'] += 1
+        newShips = {}
+        for ship, points, resStorage, mass in ships:
+            newShips[ship] = {'points': points, 'resStorage': resStorage, 'mass': mass}
+            counts['ships'] += 1
+
+        # add the players first so every new planet is built with their starting vars
+        for player, faction in newPlayers.items():
+            allPlayers[player] = {'faction': faction, 'transits': {}}
+
+        # then give the new players their starting vars on the planets that already exist
+        if newPlayers:
+            for localPlanet in allPlanets.values():
+                for player in newPlayers:
+                    localPlanet['resources'].setdefault(player, 0)
+                    localPlanet['ships'].setdefault(player, {})
+                    localPlanet['fleets'].setdefault(player, {})
+                    localPlanet['production'].setdefault(player, {})
+
+        for planet, (value, factionControl, factionAllegiance) in newPlanets.items():
+            allPlanets[planet] = self.new_planet(value, factionControl, factionAllegiance)
+
+        for planet1, planet2, distance in newConnections:
+            allPlanets[planet1]['connections'][planet2] = distance
+            allPlanets[planet2]['connections'][planet1] = distance
+
+        allShips.update(newShips)
+
+        # write everything out in one go
+        self.campaign.sync()
+        self.notify('campaign_loaded')
+
+        print(f"Loaded {counts['planets']} planets, {counts['connections']} connections, "
+              f"{counts['players']} players and {counts['ships']} ships")
+        if counts['skipped']:
+            print(f"Skipped {counts['skipped']} connections to planets that do not exist")
+        return counts
 
     def cheat_in_ship(self, planet: str, player: str, ship: str, amount: int):
         """ Cheat in ship(s) for a player on a planet instantly without spending resources
@@ -155,6 +409,7 @@ class Commands:
                     localShips[player][ship] = amount
                 # return a message for the spawned ship
                 print(f"Ship {ship} (x{amount}) spawned in on {planet} for {player}")
+                self.notify('ships_changed', planet=planet, player=player, ship=ship, amount=amount, reason='cheat')
             # if not, then return a message informing that the ship isn't added yet
             else:
                 print(f"Ship {ship} not recognized, have you added the ship to this campaign?")
@@ -177,6 +432,7 @@ class Commands:
             self.campaign['planets'][planet]['resources'][player] += amount
             # return a message for the spawned resources
             print(f"{amount} resources spawned in on {planet} for {player}")
+            self.notify('resources_changed', planet=planet, player=player, amount=amount, reason='cheat')
         # if there was a KeyError then some planet or player does not exist
         except KeyError:
             # therefore return a message informing that a planet or player does not exist
@@ -195,6 +451,7 @@ class Commands:
             if self.campaign['planets'][planet]['resources'][player] >= amount:
                 self.campaign['planets'][planet]['resources'][player] -= amount
                 print(f"{amount} resources voided on {planet} for {player}")
+                self.notify('resources_changed', planet=planet, player=player, amount=-amount, reason='void')
             else:
                 print(f'Not enough resources on {planet} ({player}) to be voided')
 
@@ -240,15 +497,20 @@ class Commands:
 
             # if the ship(s) can still be made, do so
             if canMakeShip:
+                # resources are only spent when the ship isn't queued on the planet yet
+                spent = 0
                 # queue the ship for production for the player on the planet requested
                 if ship in localProduction[player]:
                     localProduction[player][ship] += amount
                 else:
                     localProduction[player][ship] = amount
                     # and deduct the resources from the player who queued the ship(s) on the planet requested
-                    localResources[player] -= self.campaign['ships'][ship]['points'] * amount
+                    spent = self.campaign['ships'][ship]['points'] * amount
+                    localResources[player] -= spent
                 # return a message for the spawned ship
                 print(f"Ship {ship} (x{amount}) queued for production on {planet} for {player}")
+                self.notify('production_queued', planet=planet, player=player, ship=ship, amount=amount,
+                            cost=self.campaign['ships'][ship]['points'] * amount, spent=spent)
         # if there was a KeyError then some planet or player does not exist
         except KeyError:
             # therefore return a message informing that a planet or player does not exist
@@ -280,6 +542,7 @@ class Commands:
                     localShips[player][ship] -= amount
 
                 print(f'Ship {ship} (x{amount}) voided on {planet} for {player}')
+                self.notify('ships_changed', planet=planet, player=player, ship=ship, amount=-amount, reason='void')
 
         except KeyError:
             print('Some field (planet or player) does not exist, did you misspell anything?')
@@ -313,6 +576,8 @@ class Commands:
                 resourcesRecovered = amount * self.campaign['ships'][ship]['points'] * self.scrapRatio
                 localResources[player] += resourcesRecovered
                 print(f'Ship {ship} (x{amount}) scraped returning {resourcesRecovered} resources on {planet} for {player}')
+                self.notify('resources_changed', planet=planet, player=player, amount=resourcesRecovered, reason='scrap')
+                self.notify('ships_changed', planet=planet, player=player, ship=ship, amount=-amount, reason='scrap')
 
         except KeyError:
             print('Some field (planet or player) does not exist, did you misspell anything?')
@@ -370,6 +635,11 @@ class Commands:
                         del localShips[player][shipName]
                 # return a message for the newly made fleet
                 print(f'Fleet {fleet} created on {planet} for {player}')
+                self.notify('fleet_created', planet=planet, player=player, fleet=fleet, ships=dict(ships))
+                # the ships in the fleet left the planet
+                for shipName, shipAmount in ships.items():
+                    self.notify('ships_changed', planet=planet, player=player, ship=shipName, amount=-shipAmount,
+                                reason='transfer')
 
         # if there was a KeyError then some planet or player does not exist
         except KeyError:
@@ -409,11 +679,20 @@ class Commands:
                     else:
                         localShips[player][shipName] = shipAmount
                 # also add all the resources the fleet has to the planet
-                localResources[player] += localFleets[player][fleet]['resources']
+                fleetResources = localFleets[player][fleet]['resources']
+                localResources[player] += fleetResources
                 # then remove the fleet
-                del localFleets[player][fleet]
+                fleetShips = localFleets[player].pop(fleet)['ships']
                 # return a message for the disbanded fleet
                 print(f'Fleet {fleet} disbanded on {planet}')
+                self.notify('fleet_disbanded', planet=planet, player=player, fleet=fleet)
+                # the ships and resources in the fleet are back on the planet
+                for shipName, shipAmount in fleetShips.items():
+                    self.notify('ships_changed', planet=planet, player=player, ship=shipName, amount=shipAmount,
+                                reason='transfer')
+                if fleetResources:
+                    self.notify('resources_changed', planet=planet, player=player, amount=fleetResources,
+                                reason='transfer')
 
         # if there was a KeyError then some planet or player does not exist
         except KeyError:
@@ -485,6 +764,10 @@ class Commands:
                     localFleets[playerTo][locationTo]['resources'] += amount
                 # return a message about the transfer
                 print(f"Transfer of {amount} on {planet} from {locationFrom} ({playerFrom}) to {locationTo} ({playerTo}) completed")
+                self.notify('resources_changed', planet=planet, player=playerFrom, amount=-amount, reason='transfer',
+                            fleet=None if locationFrom == planet else locationFrom)
+                self.notify('resources_changed', planet=planet, player=playerTo, amount=amount, reason='transfer',
+                            fleet=None if locationTo == planet else locationTo)
 
         # if there was a KeyError then some planet or player does not exist
         except KeyError:
@@ -530,6 +813,7 @@ class Commands:
 
                 del localFleets[player][fleet]
                 print(f'Fleet {fleet} ({player}) queued for transit from {planetFrom} to {planetTo}')
+                self.notify('fleet_departed', planet=planetFrom, player=player, fleet=fleet, planetTo=planetTo)
 
         except KeyError:
             print('Some field (planet / player/ fleet) does not exist, did you misspell anything?')
@@ -565,6 +849,7 @@ class Commands:
                     localFleets[player][fleet]['resources'] -= travelCost
                     self.campaign['planets'][planetTo]['fleets'][player][fleet] = localFleets[player][fleet]
                     print(f'Fleet {fleet} arrived on {planetTo} from {planetFrom}')
+                    self.notify('resources_changed', planet=planetTo, player=player, amount=-travelCost, reason='fuel', fleet=fleet)
                 else:
                     localPlayer['transits'][fleet] = {}
                     transitFleet = localPlayer['transits'][fleet]
@@ -579,6 +864,9 @@ class Commands:
                     print(f'Fleet {fleet} ({player}) queued for transit from {planetFrom} to {planetTo}')
 
                 del localFleets[player][fleet]
+                self.notify('fleet_departed', planet=planetFrom, player=player, fleet=fleet, planetTo=planetTo)
+                if travelDistance == 1:
+                    self.notify('fleet_arrived', planet=planetTo, player=player, fleet=fleet, planetFrom=planetFrom)
 
         except KeyError:
             print('Some field (planet / player/ fleet) does not exist, did you misspell anything?')
@@ -599,9 +887,11 @@ class Commands:
                 if transit['progress'] >= travelDistance:
                     self.campaign['planets'][transit['planetTo']]['fleets'][player][fleet] = transit['fleet']
                     print(f"Fleet {fleet} ({player}) has canceled transit from {transit['planetFrom']}")
+                    self.notify('fleet_arrived', planet=transit['planetTo'], player=player, fleet=fleet, planetFrom=transit['planetFrom'])
                     del self.campaign['players'][player]['transits'][fleet]
                 else:
                     print(f"Fleet {fleet} ({player}) queued for transit from {transit['planetFrom']} to {transit['planetTo']}")
+                    self.notify('fleet_turned', player=player, fleet=fleet, planetFrom=transit['planetFrom'], planetTo=transit['planetTo'])
             else:
                 print(f'Not enough resources on fleet {fleet} to turn around')
         else:
@@ -622,14 +912,21 @@ class Commands:
                 if transit['transitType'] == 'hohmann':
                     transit['fleet']['resources'] -= transit['costPerUnit']
                     transit['progress'] += 1
+                    self.notify('resources_changed', planet=None, player=player, amount=-transit['costPerUnit'],
+                                reason='fuel', fleet=fleet)
 
                 elif transit['transitType'] == 'brachistochrone':
                     transit['fleet']['resources'] -= (transit['costPerUnit'] * 2)
                     transit['progress'] += 2
+                    self.notify('resources_changed', planet=None, player=player, amount=-transit['costPerUnit'] * 2,
+                                reason='fuel', fleet=fleet)
+                self.notify('transit_progress', player=player, fleet=fleet, planetFrom=transit['planetFrom'],
+                            planetTo=transit['planetTo'], progress=transit['progress'], distance=distance)
 
                 if transit['progress'] >= distance:
                     self.campaign['planets'][transit['planetTo']]['fleets'][player][fleet] = transit['fleet']
                     print(f"Fleet {fleet} ({player}) has arrived at {transit['planetTo']} from {transit['planetFrom']}")
+                    self.notify('fleet_arrived', planet=transit['planetTo'], player=player, fleet=fleet, planetFrom=transit['planetFrom'])
                     atDestination.append(fleet)
                 else:
                     print(f"Fleet {fleet} ({player}) is transfering to {transit['planetTo']} from {transit['planetFrom']}, "
@@ -639,41 +936,19 @@ class Commands:
                 del self.campaign['players'][player]['transits'][fleet]
 
         # battles
-        for planet in self.campaign['planets']:
-            localPlanet = self.campaign['planets'][planet]
-            factionsOnPlanet = {}
-            for player in self.campaign['players']:
-                faction = self.campaign['players'][player]['faction']
-
-                for ship in localPlanet['ships'][player]:
-                    if faction not in factionsOnPlanet:
-                        factionsOnPlanet[faction] = {}
-                    if ship in factionsOnPlanet[faction]:
-                        factionsOnPlanet[faction][ship] += localPlanet['ships'][player][ship]
-                    else:
-                        factionsOnPlanet[faction][ship] = localPlanet['ships'][player][ship]
-
-                for fleet in localPlanet['fleets'][player]:
-                    localFleet = localPlanet['fleets'][player][fleet]
-                    for ship in localFleet['ships']:
-                        if faction not in factionsOnPlanet:
-                            factionsOnPlanet[faction] = {}
-                        if ship in factionsOnPlanet[faction]:
-                            factionsOnPlanet[faction][ship] += localFleet['ships'][ship]
-                        else:
-                            factionsOnPlanet[faction][ship] = localFleet['ships'][ship]
-
-            if len(factionsOnPlanet) > 1:
-                factions = ''
-                for faction in factionsOnPlanet:
-                    factions += faction + ', '
-                print(f"Battle on {planet} between {factions[0:-2]}")
-                for faction in factionsOnPlanet:
-                    print(f'Ships for {faction}:')
-                    for shipName, shipAmount in factionsOnPlanet[faction].items():
-                        print(f'{shipName} (x{shipAmount})')
+        for planet, factionsOnPlanet in find_battles(self.campaign['planets'], self.campaign['players']).items():
+            factions = ''
+            for faction in factionsOnPlanet:
+                factions += faction + ', '
+            print(f"Battle on {planet} between {factions[0:-2]}")
+            for faction in factionsOnPlanet:
+                print(f'Ships for {faction}:')
+                for shipName, shipAmount in factionsOnPlanet[faction].items():
+                    print(f'{shipName} (x{shipAmount})')
+            self.notify('battle', planet=planet, factions=factionsOnPlanet)
         # advance the turn count
         self.campaign['turn'] += 1
+        self.notify('turn_ended', turn=self.campaign['turn'])
 
     def start_turn(self):
         for planet in self.campaign['planets']:
@@ -683,6 +958,7 @@ class Commands:
                 # add income to all players
                 if self.campaign['players'][player]['faction'] == localPlanet['factionControl']:
                     localPlanet['resources'][player] += localPlanet['value']
+                    self.notify('resources_changed', planet=planet, player=player, amount=localPlanet['value'], reason='income')
 
                 # produce ships for all players
                 for shipName, shipAmount in localPlanet['production'][player].items():
@@ -691,14 +967,23 @@ class Commands:
                     else:
                         localPlanet['ships'][player][shipName] = shipAmount
                     print(f"Production of {shipName} (x{shipAmount}) on {planet} for {player} has finished")
+                    self.notify('ships_changed', planet=planet, player=player, ship=shipName, amount=shipAmount, reason='built')
                 localPlanet['production'][player].clear()
 
         # notify the user that the next turn is starting
         print(f"--------------------start turn {self.campaign['turn']}--------------------")
+        self.notify('turn_started', turn=self.campaign['turn'])
         # save the campaign (look into saving more times and opening/closing the shelve dynamically as users will not input all commands
         # instantly like the controller currently does)
         self.campaign.sync()
 
+    def snapshot(self):
+        """ Make a detached copy of the whole campaign that is safe to read while the campaign keeps changing
+        :return: dict with the planets, players, ships and turn of the campaign
+        """
+        return {key: copy.deepcopy(self.campaign[key]) for key in ('planets', 'players', 'ships', 'turn')
+                if key in self.campaign}
+
     def get_details(self, arg):
         islist = self.list(arg)
         if arg in self.campaign['planets']:
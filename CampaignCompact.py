@@ -0,0 +1,182 @@
+import argparse
+import dbm
+import os
+import pickle
+import shelve
+import sqlite3
+import time
+
+from CampaignCommands import SAVE_SUFFIXES, SCHEMA_VERSION
+from CampaignReplay import first_difference
+
+# keys of the save holding a dict of entities, verified one entity at a time
+ENTITY_KEYS = ('planets', 'players', 'ships')
+
+
+def migrate_to_1(key: str, value, context: dict):
+    """ Fill in every planet and player field added since the first saves, so old saves load like new ones
+    :param key: key of the save being migrated
+    :param value: what is stored at the key
+    :param context: the players of the save
+    :return: the migrated value
+    """
+    if key == 'planets':
+        for localPlanet in value.values():
+            localPlanet.setdefault('connections', {})
+            for field, default in (('resources', 0), ('ships', {}), ('fleets', {}), ('production', {})):
+                playerValues = localPlanet.setdefault(field, {})
+                for player in context['players']:
+                    if player not in playerValues:
+                        playerValues[player] = default.copy() if isinstance(default, dict) else default
+    elif key == 'players':
+        for localPlayer in value.values():
+            localPlayer.setdefault('transits', {})
+    return value
+
+
+# (version migrated to, migration) in order, each migration takes a save from the version before it
+MIGRATIONS = [
+    (1, migrate_to_1),
+]
+
+
+def save_files(path: str):
+    return [path + suffix for suffix in SAVE_SUFFIXES if os.path.isfile(path + suffix)]
+
+
+def save_size(path: str):
+    """ Get the size on disk of a save
+    :param path: path of the save, as given to shelve.open
+    :return: size in bytes of every file of the save
+    """
+    return sum(os.path.getsize(file) for file in save_files(path))
+
+
+def time_load(path: str):
+    """ Time loading every entry of a save, like the controller does on its first commands
+    :param path: path of the save
+    :return: seconds taken
+    """
+    start = time.perf_counter()
+    with shelve.open(path, flag='r') as save:
+        for key in save:
+            save[key]
+    return time.perf_counter() - start
+
+
+def migrate_entry(key: str, value, version: int, context: dict):
+    for migrationVersion, migration in MIGRATIONS:
+        if migrationVersion > version:
+            value = migration(key, value, context)
+    return value
+
+
+def compact_save(source: str, target: str):
+    """ Stream a save into a freshly written one, applying every schema migration it is missing on the way.
+    Only one entry of the save is held in memory at a time (the players are kept for the migrations).
+    :param source: path of the save to compact
+    :param target: path of the new save, anything already there is overwritten
+    :return: dict of the keys copied and the schema versions before and after
+    """
+    with shelve.open(source, flag='r') as old, shelve.open(target, flag='n', protocol=pickle.HIGHEST_PROTOCOL) as new:
+        version = old.get('schemaVersion', 0)
+        if version > SCHEMA_VERSION:
+            raise ValueError(f'Save {source} has schema version {version}, newer than this tool knows '
+                             f'({SCHEMA_VERSION})')
+        context = {'players': list(old.get('players', {}))}
+
+        keys = [key for key in old.keys() if key != 'schemaVersion']
+        for key in keys:
+            new[key] = migrate_entry(key, old[key], version, context)
+        new['schemaVersion'] = SCHEMA_VERSION
+    return {'keys': keys, 'fromVersion': version, 'toVersion': SCHEMA_VERSION}
+
+
+def verify_save(source: str, target: str):
+    """ Check a compacted save against the save it was made from, entity by entity
+    :param source: path of the original save
+    :param target: path of the compacted save
+    :return: list of differences, empty if the compacted save holds the same (migrated) campaign
+    """
+    differences = []
+    with shelve.open(source, flag='r') as old, shelve.open(target, flag='r') as new:
+        version = old.get('schemaVersion', 0)
+        context = {'players': list(old.get('players', {}))}
+        keys = (set(old.keys()) | set(new.keys())) - {'schemaVersion'}
+        for key in sorted(keys):
+            if key not in old or key not in new:
+                differences.append(f'/{key} (missing from {"original" if key not in old else "compacted"})')
+                continue
+            expected = migrate_entry(key, old[key], version, context)
+            actual = new[key]
+            if key in ENTITY_KEYS:
+                # compare entity by entity so a difference names the planet, player or ship it is in
+                for entity in sorted(expected.keys() | actual.keys()):
+                    difference = first_difference(expected.get(entity), actual.get(entity), f'/{key}/{entity}')
+                    if difference:
+                        differences.append(difference)
+            else:
+                difference = first_difference(expected, actual, f'/{key}')
+                if difference:
+                    differences.append(difference)
+    return differences
+
+
+def replace_save(source: str, target: str, backup: str):
+    """ Move the files of the original save to the backup path and the compacted save in its place
+    :return: None
+    """
+    for file in save_files(source):
+        os.replace(file, backup + file[len(source):])
+    for file in save_files(target):
+        os.replace(file, source + file[len(target):])
+
+
+def compact_sqlite(path: str):
+    """ Rebuild a SQLite save to drop the space left by deleted rows
+    :param path: path of the .sqlite save
+    :return: dict of the size before and after
+    """
+    before = sum(os.path.getsize(path + suffix) for suffix in ('', '-wal') if os.path.isfile(path + suffix))
+    db = sqlite3.connect(path)
+    db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    db.execute('VACUUM')
+    db.close()
+    return {'before': before, 'after': os.path.getsize(path)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compact a campaign save and migrate it to the current schema')
+    parser.add_argument('save', nargs='?', default='IncursionSave', help='path of the save, as given to the controller')
+    parser.add_argument('--output', help='write the compacted save here instead of replacing the original')
+    args = parser.parse_args()
+
+    if args.save.endswith('.sqlite'):
+        sizes = compact_sqlite(args.save)
+        print(f"Compacted {args.save}: {sizes['before']} -> {sizes['after']} bytes")
+        raise SystemExit(0)
+
+    if dbm.whichdb(args.save) is None:
+        raise SystemExit(f'No save found at {args.save}')
+
+    target = args.output or args.save + '.compact'
+    sizeBefore = save_size(args.save)
+    loadBefore = time_load(args.save)
+    result = compact_save(args.save, target)
+    differences = verify_save(args.save, target)
+    if differences:
+        for difference in differences:
+            print(f'Compacted save differs at {difference}')
+        raise SystemExit(f'Verification failed, the original save was left untouched and the new one is at {target}')
+
+    if not args.output:
+        backup = args.save + '.old'
+        replace_save(args.save, target, backup)
+        target = args.save
+        print(f'Original save kept at {backup}')
+    sizeAfter = save_size(target)
+    loadAfter = time_load(target)
+    print(f"Migrated schema version {result['fromVersion']} -> {result['toVersion']}, "
+          f"{len(result['keys'])} entries verified")
+    print(f'Size: {sizeBefore} -> {sizeAfter} bytes')
+    print(f'Load time: {loadBefore * 1000:.1f} -> {loadAfter * 1000:.1f} ms')
@@ -0,0 +1,181 @@
+from bisect import bisect_left, insort
+
+from CampaignCommands import Commands
+
+
+class PrefixIndex:
+    """ Sorted names that can be looked up by prefix in O(log n + matches). Names are counted, so a
+    name added twice (the same fleet name on two planets) stays until it is removed twice.
+    """
+
+    def __init__(self, names=()):
+        self.counts = {}
+        for name in names:
+            self.counts[name] = self.counts.get(name, 0) + 1
+        self.names = sorted(self.counts)
+
+    def add(self, name: str):
+        if name not in self.counts:
+            insort(self.names, name)
+            self.counts[name] = 0
+        self.counts[name] += 1
+
+    def remove(self, name: str):
+        if name not in self.counts:
+            return
+        self.counts[name] -= 1
+        if self.counts[name] <= 0:
+            del self.counts[name]
+            del self.names[bisect_left(self.names, name)]
+
+    def complete(self, prefix: str):
+        """ Get every name starting with a prefix
+        :param prefix: start of the name
+        :return: list of names in sorted order
+        """
+        matches = []
+        for name in self.names[bisect_left(self.names, prefix):]:
+            if not name.startswith(prefix):
+                break
+            matches.append(name)
+        return matches
+
+
+class NameIndex:
+    """ Prefix indexes of every planet, player, ship and fleet name in a campaign, kept in step with the
+    change notifications of the campaign. Fleets are indexed by player and planet (None for fleets in transit).
+    """
+
+    def __init__(self, campaign: Commands):
+        self.campaign = campaign
+        self.rebuild()
+        campaign.add_listener(self.handle_event)
+
+    def rebuild(self):
+        """ Index every name in the campaign from scratch
+        :return: None
+        """
+        campaign = self.campaign.campaign
+        planets = campaign.get('planets', {})
+        players = campaign.get('players', {})
+        self.planets = PrefixIndex(planets)
+        self.players = PrefixIndex(players)
+        self.ships = PrefixIndex(campaign.get('ships', {}))
+        # (player, planet) -> PrefixIndex of fleet names, and player -> PrefixIndex of all their fleet names
+        self.fleets = {}
+        self.playerFleets = {}
+
+        for planet in planets:
+            for player, playerFleets in planets[planet]['fleets'].items():
+                for fleet in playerFleets:
+                    self.add_fleet(player, planet, fleet)
+        for player in players:
+            for fleet in players[player]['transits']:
+                self.add_fleet(player, None, fleet)
+
+    def add_fleet(self, player: str, planet, fleet: str):
+        self.fleets.setdefault((player, planet), PrefixIndex()).add(fleet)
+        self.playerFleets.setdefault(player, PrefixIndex()).add(fleet)
+
+    def remove_fleet(self, player: str, planet, fleet: str):
+        if (player, planet) in self.fleets and fleet in self.fleets[(player, planet)].counts:
+            self.fleets[(player, planet)].remove(fleet)
+            self.playerFleets[player].remove(fleet)
+
+    def handle_event(self, event: str, details: dict):
+        """ Update the indexes from a campaign change notification
+        :param event: name of the event
+        :param details: dict of the event details
+        :return: None
+        """
+        if event == 'planet_added':
+            if details['planet'] in self.planets.counts:
+                # re-adding a planet removes every fleet on it
+                self.rebuild()
+            else:
+                self.planets.add(details['planet'])
+        elif event == 'player_added':
+            if details['player'] not in self.players.counts:
+                self.players.add(details['player'])
+        elif event == 'ship_registered':
+            if details['ship'] not in self.ships.counts:
+                self.ships.add(details['ship'])
+        elif event == 'fleet_created':
+            self.add_fleet(details['player'], details['planet'], details['fleet'])
+        elif event == 'fleet_disbanded':
+            self.remove_fleet(details['player'], details['planet'], details['fleet'])
+        elif event == 'fleet_departed':
+            self.remove_fleet(details['player'], details['planet'], details['fleet'])
+            # a new transit replaces any transit of the player with the same fleet name
+            self.remove_fleet(details['player'], None, details['fleet'])
+            self.add_fleet(details['player'], None, details['fleet'])
+        elif event == 'fleet_arrived':
+            self.remove_fleet(details['player'], None, details['fleet'])
+            # an arriving fleet replaces a fleet of the player with the same name already there
+            self.remove_fleet(details['player'], details['planet'], details['fleet'])
+            self.add_fleet(details['player'], details['planet'], details['fleet'])
+        elif event == 'campaign_loaded':
+            self.rebuild()
+
+    def close(self):
+        """ Stop following the campaign
+        :return: None
+        """
+        self.campaign.remove_listener(self.handle_event)
+
+    def complete(self, kind: str, prefix: str, player: str = None, planet: str = None):
+        """ Complete a name
+        :param kind: planet, player, ship, any (planet, player or ship), fleet, transit or location (a fleet or the planet)
+        :param prefix: what has been typed of the name so far
+        :param player: player the fleet belongs to, for fleet, transit and location
+        :param planet: planet the fleet is on, for fleet and location, None for a fleet on any planet
+        :return: sorted list of names
+        """
+        if kind == 'planet':
+            return self.planets.complete(prefix)
+        if kind == 'player':
+            return self.players.complete(prefix)
+        if kind == 'ship':
+            return self.ships.complete(prefix)
+        if kind == 'any':
+            return sorted(self.planets.complete(prefix) + self.players.complete(prefix) + self.ships.complete(prefix))
+        if kind == 'transit':
+            return self.fleets.get((player, None), PrefixIndex()).complete(prefix)
+        if kind in ('fleet', 'location'):
+            if planet is None:
+                return self.playerFleets.get(player, PrefixIndex()).complete(prefix)
+            names = self.fleets.get((player, planet), PrefixIndex()).complete(prefix)
+            if kind == 'location' and planet.startswith(prefix):
+                names = sorted(names + [planet])
+            return names
+        return []
+
+
+def split_arguments(text: str):
+    """ Split the arguments of a shell command typed so far, like "['Sulfas', 'Star"
+    :param text: everything typed after the command name
+    :return: list of the finished arguments without quotes, the unfinished argument and where its name starts in text
+    """
+    arguments = []
+    current = ''
+    start = 0
+    quote = None
+    for index, char in enumerate(text):
+        if quote:
+            if char == quote:
+                quote = None
+            else:
+                current += char
+        elif char in '\'"':
+            quote = char
+            current = ''
+            start = index + 1
+        elif char == ',':
+            arguments.append(current.strip())
+            current = ''
+            start = index + 1
+        elif char in '[{ ' and not current:
+            start = index + 1
+        else:
+            current += char
+    return arguments, current, start
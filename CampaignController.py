@@ -1,18 +1,139 @@
 from cmd import Cmd
 
-from CampaignCommands import Commands
+from CampaignAI import generate_ai_orders
+from CampaignAnalytics import GraphAnalytics
+from CampaignAudit import Auditor
+from CampaignCompletion import NameIndex, split_arguments
+from CampaignFeed import ChangeFeed, FeedServer
+from CampaignImport import import_files
+from CampaignLogistics import plan_logistics
+from CampaignReplay import apply_order
+from CampaignReports import write_reports
+from CampaignServer import SnapshotServer
+from CampaignSQLite import SQLiteCommands, open_commands
+from CampaignVisibility import VisibilityCache
 from IncursionInit import initalizeSave
 
-from os import listdir
+from dbm import whichdb
+import os
+import sqlite3
+import sys
 
 
 class IncursionShell(Cmd):
-    def __init__(self, file: str):
+    # what each argument of a command names, for tab completion. Fleets are given as
+    # (kind, index of the player argument, index of the planet argument or None for any planet)
+    argumentKinds = {
+        'add_connection': ('planet', 'planet'),
+        'set_planet_control': ('planet',),
+        'materialize_resources': ('planet', 'player'),
+        'banish_resources': ('planet', 'player'),
+        'materialize_ship': ('planet', 'player', 'ship'),
+        'banish_ship': ('planet', 'player', 'ship'),
+        'make_ship': ('planet', 'player', 'ship'),
+        'scrap_ship': ('planet', 'player', 'ship'),
+        'make_fleet': ('planet', 'player'),
+        'disband_fleet': ('planet', 'player', ('fleet', 1, 0)),
+        'transfer_resources': ('planet', None, 'player', ('location', 2, 0), 'player', ('location', 4, 0)),
+        'hohmann_transfer': ('player', ('fleet', 0, None), 'planet', 'planet'),
+        'brachistochrone_transfer': ('player', ('fleet', 0, None), 'planet', 'planet'),
+        'turn_fleet': ('player', ('transit', 0, None)),
+        'get_details': ('any',),
+        'get_visible_details': ('player', 'any'),
+        'visible_planets': ('player',),
+    }
+
+    # commands that only read the campaign, the only ones available when it is opened read-only
+    readOnlyCommands = ('get_details', 'get_visible_details', 'visible_planets', 'write_reports', 'refresh',
+                        'query', 'fleets_with_resources', 'analyze', 'help', 'exit')
+
+    def __init__(self, file: str, readOnly: bool = False):
         Cmd.__init__(self)
-        self.campaign = Commands(file)
+        self.campaign = open_commands(file, readOnly)
+        self.visibilityCache = None
+        self.analyticsCache = None
+        # the auditor has to see every change, so it is attached from the start when editing
+        self.auditor = None if readOnly else Auditor(self.campaign)
+        self.server = None
+        # the change feed only starts recording once something asks for it
+        self.feed = None
+        self.feedServer = None
+        # only built on the first tab completion
+        self.nameIndex = None
+
+    @property
+    def visibility(self):
+        # only built when first needed, it has to read every planet
+        if self.visibilityCache is None:
+            self.visibilityCache = VisibilityCache(self.campaign)
+        return self.visibilityCache
+
+    @property
+    def analytics(self):
+        # only built when first needed, then kept up to date as the map and planet control change
+        if self.analyticsCache is None:
+            self.analyticsCache = GraphAnalytics(self.campaign)
+        return self.analyticsCache
+
+    def completedefault(self, text, line, begidx, endidx):
+        command = line.split(' ', 1)[0]
+        if command not in self.argumentKinds:
+            return []
+        if self.nameIndex is None:
+            self.nameIndex = NameIndex(self.campaign)
+
+        argsStart = len(command)
+        arguments, current, start = split_arguments(line[argsStart:endidx])
+        kinds = self.argumentKinds[command]
+        if len(arguments) >= len(kinds) or kinds[len(arguments)] is None:
+            return []
+        kind = kinds[len(arguments)]
+
+        if isinstance(kind, tuple):
+            kind, playerIndex, planetIndex = kind
+            player = arguments[playerIndex]
+            planet = None if planetIndex is None else arguments[planetIndex]
+            names = self.nameIndex.complete(kind, current.lstrip(), player, planet)
+        else:
+            names = self.nameIndex.complete(kind, current.lstrip())
+
+        # readline replaces only the text after the last delimiter, which can start inside a name with spaces
+        nameStart = argsStart + start + len(current) - len(current.lstrip())
+        if begidx >= nameStart:
+            return [name[begidx - nameStart:] for name in names]
+        return [line[begidx:nameStart] + name for name in names]
+
+    def precmd(self, line):
+        command = line.split(' ', 1)[0].strip()
+        if self.campaign.readOnly and command and command not in self.readOnlyCommands and command != '?':
+            print(f'Campaign is opened read-only, {command} is not available')
+            return ''
+        return line
+
+    def emptyline(self):
+        pass
+
+    def do_refresh(self, arg):
+        """Reload the campaign from the last save the GM wrote (read-only mode)."""
+        if self.campaign.readOnly:
+            if not isinstance(self.campaign, SQLiteCommands):
+                self.campaign.campaign.refresh()
+            # the caches are built again from the refreshed save when next needed
+            for cache in (self.visibilityCache, self.analyticsCache, self.nameIndex):
+                if cache is not None:
+                    cache.close()
+            self.visibilityCache = None
+            self.analyticsCache = None
+            self.nameIndex = None
+        else:
+            print('Campaign is opened for editing, it is always up to date')
 
     def do_exit(self, arg):
         """Exits the program."""
+        if self.server is not None:
+            self.server.close()
+        if self.feedServer is not None:
+            self.feedServer.close()
         self.campaign.close_campaign()
         print("Exiting the program.")
         raise SystemExit
@@ -37,6 +158,28 @@ class IncursionShell(Cmd):
         except (ValueError, SyntaxError):
             print('Invalid Input, Try again')
 
+    def do_set_planet_control(self, args):
+        """ Change the faction that controls a planet
+        format: [planet, factionControl]
+        """
+        try:
+            argList = eval(args)
+            self.campaign.set_planet_control(argList[0], argList[1])
+        except (ValueError, SyntaxError):
+            print('Invalid Input, Try again')
+
+    def do_import(self, args):
+        """ Bulk import planets, connections, players and ships from CSV or JSON-lines files
+        format: {'planets': path, 'connections': path, 'players': path, 'ships': path} (any can be left out)
+        """
+        try:
+            argDict = eval(args)
+            import_files(self.campaign, **argDict)
+        except (ValueError, SyntaxError, TypeError) as error:
+            print(f'Invalid Input, Try again ({error})')
+        except OSError as error:
+            print(f'Could not read file: {error}')
+
     def do_add_player(self, args):
         """ Add a player to the campaign
         format: [name, faction]
@@ -178,11 +321,11 @@ class IncursionShell(Cmd):
         except (ValueError, SyntaxError):
             print('Invalid Input, Try again')
 
-    def do_end_turn(self):
+    def do_end_turn(self, arg):
         """ End the turn by calculate fleet travel and resolving battles (ships have to be banished manually)"""
         self.campaign.end_turn()
 
-    def do_start_turn(self):
+    def do_start_turn(self, arg):
         """Start the next turn by adding income and building ships that have been queued (don't call this before end_turn)"""
         self.campaign.start_turn()
 
@@ -190,13 +333,196 @@ class IncursionShell(Cmd):
         """Prints out the details of the input (planet, player, or ship). This is a raw print of the dict, so its not pretty"""
         self.campaign.get_details(arg)
 
+    def do_write_reports(self, arg):
+        """ Write a turn report for every player to a directory, one file per player
+        format: directory (defaults to reports)
+        """
+        write_reports(self.campaign, arg or 'reports')
+
+    def do_audit(self, arg):
+        """Check for resources or ships created or destroyed without a record since the last check (also run at start_turn)."""
+        self.auditor.check()
+
+    def do_full_audit(self, arg):
+        """Recount every planet, fleet and transit and check for resources or ships created or destroyed without a record."""
+        self.auditor.full_check()
+
+    def do_ledger(self, arg):
+        """Prints the resources and ships held, and the totals that entered and left the game by reason."""
+        for kind, entry in self.auditor.ledger().items():
+            print(f"{kind}: held {entry['held']}, in {entry['in']}, out {entry['out']}")
+
+    def do_query(self, arg):
+        """ Run a read-only SQL query against a SQLite campaign and print the rows
+        format: SELECT ... (tables: planets, connections, players, ship_classes, holdings, planet_ships, fleets,
+        fleet_ships, transits, production)
+        """
+        if not isinstance(self.campaign, SQLiteCommands):
+            print('Queries need a SQLite campaign (a save ending in .sqlite)')
+            return
+        try:
+            for row in self.campaign.query(arg):
+                print(row)
+        except sqlite3.Error as error:
+            print(f'Invalid query: {error}')
+
+    def do_fleets_with_resources(self, args):
+        """ Lists the fleets of a faction holding more than an amount of resources (SQLite campaigns only)
+        format: [faction, minResources]
+        """
+        if not isinstance(self.campaign, SQLiteCommands):
+            print('Queries need a SQLite campaign (a save ending in .sqlite)')
+            return
+        try:
+            argList = eval(args)
+            for row in self.campaign.fleets_with_resources(argList[0], argList[1]):
+                print(row)
+        except (ValueError, SyntaxError):
+            print('Invalid Input, Try again')
+
+    def do_serve(self, arg):
+        """ Serve JSON snapshots of the campaign (refreshed after every start_turn) to map viewers
+        format: port (defaults to 8080)
+        """
+        if self.server is not None:
+            print('Already serving, use stop_serving first')
+            return
+        try:
+            self.server = SnapshotServer(self.campaign, int(arg or 8080))
+        except ValueError:
+            print('Invalid Input, Try again')
+        except OSError as error:
+            print(f'Could not start serving: {error}')
+
+    def do_stop_serving(self, arg):
+        """Stop serving campaign snapshots."""
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+            print('Stopped serving')
+
+    def do_serve_feed(self, arg):
+        """ Stream every change to the campaign to local consumers, one JSON record per line. A consumer sends the
+        last sequence number it has seen (0 to start from the first change) and then receives every change after it.
+        A consumer that sends "snapshot", or is too far behind to catch up, first receives a snapshot of the campaign
+        with the last sequence it includes
+        format: port (defaults to 8081)
+        """
+        if self.feedServer is not None:
+            print('Already streaming changes, use stop_feed first')
+            return
+        if self.feed is None:
+            self.feed = ChangeFeed(self.campaign)
+        try:
+            self.feedServer = FeedServer(self.feed, int(arg or 8081))
+        except ValueError:
+            print('Invalid Input, Try again')
+        except OSError as error:
+            print(f'Could not start streaming: {error}')
+
+    def do_stop_feed(self, arg):
+        """Stop streaming campaign changes."""
+        if self.feedServer is not None:
+            self.feedServer.close()
+            self.feedServer = None
+            print('Stopped streaming changes')
+
+    def do_get_visible_details(self, args):
+        """ Prints out the details of a planet, player, or ship as seen by a player (fog of war applied)
+        format: [player, name]
+        """
+        try:
+            argList = eval(args)
+            details = self.visibility.get_details(argList[0], argList[1])
+            if details is None:
+                print('Field does not exist, did you misspell anything?')
+            else:
+                print(details)
+        except (ValueError, SyntaxError):
+            print('Invalid Input, Try again')
+
+    def do_visible_planets(self, arg):
+        """ Lists the planets a player can currently see
+        format: player
+        """
+        for planet in sorted(self.visibility.visible_planets(arg)):
+            print(planet)
+
+    def do_analyze(self, arg):
+        """ Show the chokepoints, the most central planets and the front lines of the map,
+        and how far each planet is from enemy territory when a faction is given
+        format: faction (optional)
+        """
+        faction = arg.strip() or None
+        summary = self.analytics.summary(faction)
+        print(f"Chokepoints: {', '.join(summary['chokepoints']) or 'none'}")
+        print('Most central planets:')
+        for planet, centrality in list(summary['betweenness'].items())[:5]:
+            print(f'    {planet}: {centrality:.3f}')
+        print(f"Front line{' of ' + faction if faction else ''}: {', '.join(summary['frontier']) or 'none'}")
+        if faction:
+            print('Distance to enemy territory:')
+            for planet, distance in summary['distanceToEnemy'].items():
+                print(f'    {planet}: {distance}')
+
+    def do_ai_orders(self, args):
+        """ Generate this turn's orders for every player of a faction, and run them if asked
+        format: [faction, seconds to spend, run the orders (True/False, defaults to False)]
+        """
+        try:
+            argList = eval(args)
+            result = generate_ai_orders(self.campaign, argList[0], budget=argList[1])
+            runOrders = len(argList) > 2 and argList[2]
+        except (ValueError, SyntaxError, TypeError, IndexError) as error:
+            print(f'Invalid Input, Try again ({error})')
+            return
+        print(f"Best of {result['scored']}/{result['candidates']} policies scored:")
+        for method, orderArgs in result['orders']:
+            print(f'    {method} {list(orderArgs)}')
+        if runOrders:
+            for order in result['orders']:
+                apply_order(self.campaign, order)
+
+    def do_plan_logistics(self, args):
+        """ Plan the cheapest way to move a player's resources from where they are to where they are needed,
+        and run the orders for this turn if asked
+        format: [player, {planet: supply}, {planet: demand}, transfer ('hohmann'/'brachistochrone'), run the orders (True/False, defaults to False)]
+        """
+        try:
+            argList = eval(args)
+            plan = plan_logistics(self.campaign, argList[0], argList[1], argList[2], argList[3])
+            runOrders = len(argList) > 4 and argList[4]
+        except (ValueError, SyntaxError, TypeError, IndexError):
+            print('Invalid Input, Try again')
+            return
+        except KeyError:
+            print('Some field (planet / player) does not exist, did you misspell anything?')
+            return
+        for route in plan['routes']:
+            drops = ', '.join(f'{amount} at {planet}' for _, planet, amount in route['drops'])
+            print(f"Fleet {route['fleet']} carries {route['cargo']} (+{route['fuel']:.1f} fuel) along "
+                  f"{' -> '.join(route['route'])}, unloading {drops}")
+        print(f"{plan['delivered']} delivered, {plan['undelivered']} can't be delivered with the fleets available")
+        if runOrders:
+            for order in plan['orders']:
+                apply_order(self.campaign, order)
+
 if __name__ == '__main__':
     print("WARNING, this shell runs eval on all arguments so its possible to do really dumb things. Don't do those please.")
     print("Enter \"help\" or \"?\" in the terminal to show a list of commands.")
 
+    # "--read-only" opens the save for inspection only, alongside a GM that is editing it
+    readOnly = '--read-only' in sys.argv
+    # "--sqlite" uses the SQLite backend, which also allows ad-hoc queries
+    saveFile = 'IncursionSave.sqlite' if '--sqlite' in sys.argv else 'IncursionSave'
+    saveExists = os.path.exists(saveFile) if saveFile.endswith('.sqlite') else bool(whichdb(saveFile))
+    if readOnly and not saveExists:
+        print("An Incursion campaign save file wasn't found in this directory.")
+        raise SystemExit
+
     # No save file handling:
     # Checking existance of 'IncursionSave' in current directory.
-    if 'IncursionSave' not in listdir():
+    if not readOnly and not saveExists:
         print()
         print("An Incursion campaign save file wasn't found in this directory.")
         print("Would you like to initalize a new Incursion Campaign save file?")
@@ -204,13 +530,13 @@ if __name__ == '__main__':
         userinput = userinput.lower()
         if userinput == ("yes" or "y"):
             print("Initalizing new Incursion Campaign save...")
-            initalizeSave()
+            initalizeSave(saveFile)
             print("Done!")
         else:
             print("No new save was initalized - empty save created.")
         print()
     # End of save file handling.
 
-    Incursion = IncursionShell('IncursionSave')
+    Incursion = IncursionShell(saveFile, readOnly)
     Incursion.prompt = '> '
     Incursion.cmdloop('Incursion Console v0.1 alpha')
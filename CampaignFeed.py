@@ -0,0 +1,308 @@
+import json
+import socketserver
+import threading
+from collections import deque
+from itertools import islice
+from typing import NamedTuple
+
+from CampaignCommands import Commands
+
+
+class PlanetAdded(NamedTuple):
+    sequence: int
+    planet: str
+    value: int
+    factionControl: str
+    factionAllegiance: str
+
+
+class ConnectionAdded(NamedTuple):
+    sequence: int
+    planet1: str
+    planet2: str
+    distance: int
+
+
+class PlayerAdded(NamedTuple):
+    sequence: int
+    player: str
+    faction: str
+
+
+class ShipRegistered(NamedTuple):
+    sequence: int
+    ship: str
+    points: int
+    resStorage: int
+    mass: int
+
+
+class ResourceDelta(NamedTuple):
+    sequence: int
+    planet: str  # None while the fleet is in transit
+    player: str
+    amount: float
+    reason: str
+    fleet: str = None
+
+
+class ShipDelta(NamedTuple):
+    sequence: int
+    planet: str
+    player: str
+    ship: str
+    amount: int
+    reason: str
+
+
+class ProductionQueued(NamedTuple):
+    sequence: int
+    planet: str
+    player: str
+    ship: str
+    amount: int
+    cost: float  # resources the production should cost
+    spent: float  # resources taken from the planet, 0 if the ship was already queued on the planet
+
+
+class FleetCreated(NamedTuple):
+    """ Followed by a ShipDelta for every ship class that left the planet for the fleet """
+    sequence: int
+    planet: str
+    player: str
+    fleet: str
+    ships: dict  # ship -> amount
+
+
+class FleetDisbanded(NamedTuple):
+    """ Followed by a ShipDelta for every ship class and a ResourceDelta for the resources the fleet left on the
+    planet """
+    sequence: int
+    planet: str
+    player: str
+    fleet: str
+
+
+class FleetDeparted(NamedTuple):
+    sequence: int
+    planet: str
+    player: str
+    fleet: str
+    planetTo: str
+
+
+class FleetArrived(NamedTuple):
+    sequence: int
+    planet: str
+    player: str
+    fleet: str
+    planetFrom: str
+
+
+class FleetTurned(NamedTuple):
+    sequence: int
+    player: str
+    fleet: str
+    planetFrom: str
+    planetTo: str
+
+
+class TransitProgress(NamedTuple):
+    sequence: int
+    player: str
+    fleet: str
+    planetFrom: str
+    planetTo: str
+    progress: int
+    distance: int
+
+
+class ControlChanged(NamedTuple):
+    sequence: int
+    planet: str
+    faction: str
+    previous: str
+
+
+class Battle(NamedTuple):
+    sequence: int
+    planet: str
+    factions: dict  # faction -> {ship: amount}
+
+
+class TurnEnded(NamedTuple):
+    sequence: int
+    turn: int
+
+
+class TurnStarted(NamedTuple):
+    sequence: int
+    turn: int
+
+
+class CampaignLoaded(NamedTuple):
+    """ A different save was opened, consumers have to start again from a snapshot """
+    sequence: int
+
+
+# campaign notification -> the change record it is published as
+RECORDS = {
+    'planet_added': PlanetAdded,
+    'connection_added': ConnectionAdded,
+    'player_added': PlayerAdded,
+    'ship_registered': ShipRegistered,
+    'resources_changed': ResourceDelta,
+    'ships_changed': ShipDelta,
+    'production_queued': ProductionQueued,
+    'fleet_created': FleetCreated,
+    'fleet_disbanded': FleetDisbanded,
+    'fleet_departed': FleetDeparted,
+    'fleet_arrived': FleetArrived,
+    'fleet_turned': FleetTurned,
+    'transit_progress': TransitProgress,
+    'control_changed': ControlChanged,
+    'battle': Battle,
+    'turn_ended': TurnEnded,
+    'turn_started': TurnStarted,
+    'campaign_loaded': CampaignLoaded,
+}
+
+# record type -> the name it is sent as over the socket
+EVENTS = {record: event for event, record in RECORDS.items()}
+
+
+def record_json(record):
+    """ Encode a change record as one line of JSON
+    :param record: change record from a ChangeFeed
+    :return: str without the newline
+    """
+    return json.dumps({'event': EVENTS[type(record)], **record._asdict()}, sort_keys=True)
+
+
+def snapshot_json(sequence: int, state: dict):
+    """ Encode a snapshot as one line of JSON, for consumers that start again from it
+    :param sequence: last sequence the snapshot includes
+    :param state: campaign snapshot
+    :return: str without the newline
+    """
+    return json.dumps({'event': 'snapshot', 'sequence': sequence, 'state': state}, sort_keys=True)
+
+
+class ChangeFeed:
+    """ Publishes every change to a campaign as a typed record with a sequence number. The last records are kept
+    in a bounded queue, so a consumer that knows the last sequence it saw can catch up on just the changes since
+    then. A consumer that falls further behind than the queue reaches has to start again from a snapshot.
+    """
+
+    def __init__(self, campaign: Commands, maxlen: int = 10000):
+        self.campaign = campaign
+        self.records = deque(maxlen=maxlen)
+        # sequence of the last record published, records are numbered from 1
+        self.sequence = 0
+        self.condition = threading.Condition()
+        campaign.add_listener(self.handle_event)
+
+    def handle_event(self, event: str, details: dict):
+        if event not in RECORDS:
+            return
+        with self.condition:
+            self.sequence += 1
+            self.records.append(RECORDS[event](self.sequence, **details))
+            self.condition.notify_all()
+
+    def snapshot(self):
+        """ Take a snapshot of the campaign to start consuming the feed from
+        :return: tuple of the last sequence the snapshot includes and the snapshot
+        """
+        with self.condition:
+            return self.sequence, self.campaign.snapshot()
+
+    def changes_since(self, sequence: int):
+        """ Get every change published after a sequence number
+        :param sequence: last sequence the consumer has seen, 0 to start from the first change
+        :return: list of change records in order
+        :raises LookupError: if changes after the sequence have already dropped out of the queue
+        """
+        with self.condition:
+            return self.changes_after(sequence)
+
+    def changes_after(self, sequence: int):
+        if sequence > self.sequence:
+            raise LookupError(f'Sequence {sequence} has not been published yet, the last one is {self.sequence}')
+        oldest = self.records[0].sequence if self.records else self.sequence + 1
+        if sequence + 1 < oldest:
+            raise LookupError(f'Changes after {sequence} are no longer kept, the oldest kept is {oldest}')
+        # the sequences in the queue are consecutive, so the changes wanted start at a known index
+        return list(islice(self.records, sequence + 1 - oldest, None))
+
+    def wait(self, sequence: int, timeout: float = None):
+        """ Wait for changes after a sequence number to be published
+        :param sequence: last sequence the consumer has seen
+        :param timeout: seconds to wait at most, None to wait until there are changes
+        :return: list of change records in order, empty if the timeout ran out first
+        :raises LookupError: if changes after the sequence have already dropped out of the queue
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence > sequence, timeout)
+            return self.changes_after(sequence)
+
+    def close(self):
+        """ Stop following the campaign
+        :return: None
+        """
+        self.campaign.remove_listener(self.handle_event)
+
+
+class FeedHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        # the consumer sends the last sequence it has seen (0 to start from the first change) or "snapshot", then
+        # gets every change after it (or a snapshot) as a line of JSON, and then every new change as it is published
+        feed = self.server.feed
+        request = self.rfile.readline().strip()
+        try:
+            sequence = None if request == b'snapshot' else int(request or 0)
+        except ValueError:
+            self.wfile.write(b'{"error": "send the last sequence seen or snapshot"}\n')
+            return
+        while not self.server.closed:
+            try:
+                if sequence is None:
+                    # a consumer asking for a snapshot, or one the queue can't catch up, starts again from one
+                    sequence, state = feed.snapshot()
+                    self.wfile.write((snapshot_json(sequence, state) + '\n').encode())
+                    continue
+                records = feed.wait(sequence, timeout=1)
+            except LookupError:
+                sequence = None
+                continue
+            except OSError:
+                return
+            if records:
+                try:
+                    self.wfile.write(''.join(record_json(record) + '\n' for record in records).encode())
+                except OSError:
+                    return
+                sequence = records[-1].sequence
+
+
+class FeedServer:
+    """ Streams a change feed to consumers on a local socket, one JSON record per line """
+
+    def __init__(self, feed: ChangeFeed, port: int = 8081, host: str = '127.0.0.1'):
+        self.feed = feed
+        self.socketServer = socketserver.ThreadingTCPServer((host, port), FeedHandler)
+        self.socketServer.daemon_threads = True
+        self.socketServer.feed = feed
+        self.socketServer.closed = False
+        self.thread = threading.Thread(target=self.socketServer.serve_forever, daemon=True)
+        self.thread.start()
+        print(f'Streaming campaign changes on {host}:{self.socketServer.server_address[1]}')
+
+    def close(self):
+        """ Stop streaming and disconnect every consumer
+        :return: None
+        """
+        self.socketServer.closed = True
+        self.socketServer.shutdown()
+        self.socketServer.server_close()
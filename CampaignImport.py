@@ -0,0 +1,65 @@
+import argparse
+import csv
+import json
+
+from CampaignCommands import Commands
+
+# field names for each kind of record, and the type each field is converted to
+FIELDS = {
+    'planets': (('planet', str), ('value', int), ('factionControl', str), ('factionAllegiance', str)),
+    'connections': (('planet1', str), ('planet2', str), ('distance', int)),
+    'players': (('player', str), ('faction', str)),
+    'ships': (('ship', str), ('points', int), ('resStorage', int), ('mass', int)),
+}
+
+
+def read_records(path: str, kind: str):
+    """ Stream records of a kind from a CSV file (with a header row) or a JSON-lines file
+    :param path: path to the file, files ending in .csv are read as CSV, everything else as JSON-lines
+    :param kind: one of planets, connections, players or ships
+    :return: generator of tuples in the field order of the kind
+    """
+    fields = FIELDS[kind]
+    with open(path, newline='') as file:
+        if path.lower().endswith('.csv'):
+            rows = csv.DictReader(file)
+        else:
+            rows = (json.loads(line) for line in file if line.strip())
+
+        for lineNumber, row in enumerate(rows, 1):
+            # JSON-lines rows can also be plain lists in field order
+            if isinstance(row, list):
+                row = dict(zip((name for name, _ in fields), row))
+            try:
+                yield tuple(convert(row[name]) for name, convert in fields)
+            except (KeyError, ValueError, TypeError):
+                raise ValueError(f'Invalid {kind} record on line {lineNumber} of {path}: {row}')
+
+
+def import_files(campaign: Commands, planets: str = None, connections: str = None, players: str = None,
+                 ships: str = None):
+    """ Stream every given file into a campaign and write it in one commit
+    :param campaign: campaign to load into
+    :param planets: path of the planets file
+    :param connections: path of the connections file
+    :param players: path of the players file
+    :param ships: path of the ships file
+    :return: dict of how many of each were added
+    """
+    paths = {'planets': planets, 'connections': connections, 'players': players, 'ships': ships}
+    records = {kind: read_records(path, kind) if path else () for kind, path in paths.items()}
+    return campaign.bulk_load(records['planets'], records['connections'], records['players'], records['ships'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bulk import planets, connections, players and ships into a save')
+    parser.add_argument('save', help='campaign save to import into (created if it does not exist)')
+    parser.add_argument('--planets', help='planet, value, factionControl, factionAllegiance')
+    parser.add_argument('--connections', help='planet1, planet2, distance')
+    parser.add_argument('--players', help='player, faction')
+    parser.add_argument('--ships', help='ship, points, resStorage, mass')
+    args = parser.parse_args()
+
+    Incursion = Commands(args.save)
+    import_files(Incursion, args.planets, args.connections, args.players, args.ships)
+    Incursion.close_campaign()
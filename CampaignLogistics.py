@@ -0,0 +1,374 @@
+import heapq
+
+from CampaignCommands import Commands
+
+INFINITY = float('inf')
+# flow left over from splitting fractional amounts into routes, too little to carry
+EPSILON = 1e-9
+
+
+class FlowNetwork:
+    """ Min-cost flow by successive shortest paths, with Dijkstra on costs reduced by node potentials """
+
+    def __init__(self):
+        # node -> list of edges, each edge a list of [to, capacity left, cost, index of the reverse edge, forward],
+        # where forward is False for the reverse edges added to allow undoing flow
+        self.edges = {}
+
+    def add_node(self, node):
+        self.edges.setdefault(node, [])
+
+    def add_edge(self, node1, node2, capacity, cost):
+        self.add_node(node1)
+        self.add_node(node2)
+        self.edges[node1].append([node2, capacity, cost, len(self.edges[node2]), True])
+        self.edges[node2].append([node1, 0, -cost, len(self.edges[node1]) - 1, False])
+
+    def min_cost_flow(self, source, sink):
+        """ Send as much flow as possible from the source to the sink, as cheaply as possible
+        :return: tuple of the flow sent and its total cost
+        """
+        potentials = dict.fromkeys(self.edges, 0)
+        flow = cost = 0
+        while True:
+            # Dijkstra on the reduced costs, which stay non-negative thanks to the potentials
+            distances = {source: 0}
+            previous = {}
+            queue = [(0, 0, source)]
+            counter = 1
+            done = set()
+            while queue:
+                distance, _, node = heapq.heappop(queue)
+                if node in done:
+                    continue
+                done.add(node)
+                if node == sink:
+                    break
+                for index, (to, capacity, edgeCost, _, _) in enumerate(self.edges[node]):
+                    if capacity <= 0 or to in done:
+                        continue
+                    newDistance = distance + edgeCost + potentials[node] - potentials[to]
+                    if newDistance < distances.get(to, INFINITY):
+                        distances[to] = newDistance
+                        previous[to] = (node, index)
+                        heapq.heappush(queue, (newDistance, counter, to))
+                        counter += 1
+            if sink not in distances:
+                return flow, cost
+
+            # the search stops at the sink, nodes it didn't finish are at least as far as the sink, which keeps
+            # the reduced costs non-negative
+            for node in potentials:
+                potentials[node] += min(distances.get(node, INFINITY), distances[sink])
+
+            # push as much as the narrowest edge of the path allows
+            amount = INFINITY
+            node = sink
+            while node != source:
+                node, index = previous[node]
+                amount = min(amount, self.edges[node][index][1])
+            node = sink
+            while node != source:
+                node, index = previous[node]
+                edge = self.edges[node][index]
+                edge[1] -= amount
+                self.edges[edge[0]][edge[3]][1] += amount
+                cost += amount * edge[2]
+            flow += amount
+
+    def flows(self):
+        """ Get the flow sent along every edge that was added
+        :return: dict of (node1, node2) to the flow, only edges with flow on them
+        """
+        sent = {}
+        for node, edges in self.edges.items():
+            for to, _, _, reverse, forward in edges:
+                # the flow on an edge is the capacity its reverse edge gained, which works for unlimited edges too
+                if forward and self.edges[to][reverse][1] > 0:
+                    sent[(node, to)] = self.edges[to][reverse][1]
+        return sent
+
+
+def leg_fuel(costPerUnit: float, distance: int, transfer: str):
+    """ Work out the fuel a fleet burns on one connection, the way end_turn burns it
+    :param costPerUnit: fuel the fleet burns per distance (fleet mass over the mass ratio of the transfer)
+    :param distance: distance of the connection
+    :param transfer: hohmann or brachistochrone
+    :return: fuel burnt
+    """
+    # brachistochrone transfers longer than 1 burn twice the cost every turn and cover 2 distance, so a leg of
+    # odd length costs as much as the even length above it
+    if transfer == 'brachistochrone' and distance > 1:
+        return costPerUnit * (distance + distance % 2)
+    return costPerUnit * distance
+
+
+def route_fuel(planets: dict, costPerUnit: float, route: list, transfer: str):
+    return sum(leg_fuel(costPerUnit, planets[stop]['connections'][nextStop], transfer)
+               for stop, nextStop in zip(route, route[1:]))
+
+
+def fleet_stats(campaign: Commands, player: str, supply: dict, transfer: str):
+    """ Get the fleets of a player that can carry resources from the planets with supply
+    :return: dict of (planet, fleet) to its storage, the resources already on it and its fuel per distance
+    """
+    ratio = campaign.hohmannMassRatio if transfer == 'hohmann' else campaign.brachistochroneMassRatio
+    fleets = {}
+    for planet in supply:
+        for fleet, localFleet in campaign.campaign['planets'][planet]['fleets'][player].items():
+            stats = campaign.calculate_fleet_stats(localFleet)
+            if stats['fleetStorage'] > localFleet['resources']:
+                fleets[(planet, fleet)] = {'storage': stats['fleetStorage'], 'resources': localFleet['resources'],
+                                           'costPerUnit': stats['fleetMass'] / ratio}
+    return fleets
+
+
+def fleet_load(fleet: dict, fuel: float):
+    """ Work out what a fleet can carry on a route and the fuel it has to load for it, the resources already
+    on the fleet are burnt first
+    :return: tuple of the room left for cargo and the fuel to load
+    """
+    return fleet['storage'] - max(fleet['resources'], fuel), max(fuel - fleet['resources'], 0)
+
+
+def build_network(planets: dict, supply: dict, demand: dict, fleets: dict, assigned: dict, available: dict,
+                  transfer: str, shared: bool):
+    """ Build the flow network of a plan. Resources go from the source to the planets with supply, and from the
+    planets with demand to the sink. Each fleet already given a route is a chain of its stops, with room for
+    its cargo on the way in, that can unload at every stop with demand. With shared, the fleets not given a route
+    yet are pooled into a transit layer over the whole map, which is what picks the routes to give them.
+    """
+    network = FlowNetwork()
+    network.add_node('source')
+    network.add_node('sink')
+    for planet, amount in supply.items():
+        if amount > 0 and available[planet] > 0:
+            network.add_edge('source', ('planet', planet), min(amount, available[planet]), 0)
+            if planet in demand:
+                network.add_edge(('planet', planet), ('deliver', planet), INFINITY, 0)
+    for planet, amount in demand.items():
+        if amount > 0:
+            network.add_edge(('deliver', planet), 'sink', amount, 0)
+
+    for key, assignment in assigned.items():
+        planet, _ = key
+        route = assignment['route']
+        network.add_edge(('planet', planet), ('fleet', key, 0), assignment['cargo'], 0)
+        for index in range(1, len(route)):
+            fuel = leg_fuel(fleets[key]['costPerUnit'], planets[route[index - 1]]['connections'][route[index]],
+                            transfer)
+            network.add_edge(('fleet', key, index - 1), ('fleet', key, index), INFINITY,
+                             fuel / fleets[key]['storage'])
+            if route[index] in demand:
+                network.add_edge(('fleet', key, index), ('deliver', route[index]), INFINITY, 0)
+
+    unassigned = [key for key in fleets if key not in assigned]
+    if not shared or not unassigned:
+        return network
+    for planet in supply:
+        room = sum(fleets[key]['storage'] - fleets[key]['resources'] for key in unassigned if key[0] == planet)
+        if room > 0:
+            network.add_edge(('planet', planet), ('transit', planet), room, 0)
+    for planet, amount in demand.items():
+        if amount > 0:
+            network.add_edge(('transit', planet), ('deliver', planet), INFINITY, 0)
+    # the cheapest fuel per resource carried of any fleet still without a route, fuel grows with the fuel per
+    # distance so the same fleet is the cheapest on every connection
+    costPerUnit = min(fleets[key]['costPerUnit'] / fleets[key]['storage'] for key in unassigned)
+    for planet, localPlanet in planets.items():
+        for neighbour, distance in localPlanet['connections'].items():
+            if neighbour in planets:
+                network.add_edge(('transit', planet), ('transit', neighbour), INFINITY,
+                                 leg_fuel(costPerUnit, distance, transfer))
+    return network
+
+
+def split_routes(sent: dict, planet: str):
+    """ Split the flow pooled in the transit layer from a planet into routes to the planets it is delivered to
+    :param sent: dict of node to {next node: flow}, the flow of the routes found is taken out of it
+    :param planet: planet the resources are loaded on
+    :return: list of (list of planets on the route, amount)
+    """
+    routes = []
+    start = ('transit', planet)
+    while sent.get(('planet', planet), {}).get(start, 0) > EPSILON:
+        path = [('planet', planet), start]
+        amount = sent[('planet', planet)][start]
+        # follow any edge that still has flow left, until the flow leaves the transit layer to be delivered
+        while path[-1][0] == 'transit':
+            to, flow = max(sent[path[-1]].items(), key=lambda item: item[1])
+            amount = min(amount, flow)
+            path.append(to)
+
+        for node, to in zip(path, path[1:]):
+            sent[node][to] -= amount
+        routes.append(([node[1] for node in path[1:-1]], amount))
+    return routes
+
+
+def shortest_routes(planets: dict, start: str, transfer: str):
+    """ Dijkstra over the distance a fleet burns fuel for from one planet
+    :return: dict of planet to the route there from the start
+    """
+    routes = {}
+    queue = [(0, start, [start])]
+    while queue:
+        distance, planet, route = heapq.heappop(queue)
+        if planet in routes:
+            continue
+        routes[planet] = route
+        for neighbour, length in planets[planet]['connections'].items():
+            if neighbour in planets and neighbour not in routes:
+                heapq.heappush(queue, (distance + leg_fuel(1, length, transfer), neighbour, route + [neighbour]))
+    return routes
+
+
+def candidate_routes(planets: dict, routes: list, transfer: str, fromPlanet: dict):
+    """ Get the routes a fleet could be given: every route pooled from its planet, and each of them carried on to
+    the nearest planets the others deliver to, so one fleet can serve several of them
+    :param routes: list of (list of planets on the route, amount) pooled from the planet
+    :param fromPlanet: dict of planet to its shortest_routes, filled in as planets are needed
+    :return: list of routes
+    """
+    destinations = {route[-1] for route, _ in routes}
+    candidates = []
+    for route, _ in routes:
+        route = list(route)
+        candidates.append(route)
+        left = destinations - set(route)
+        while left:
+            if route[-1] not in fromPlanet:
+                fromPlanet[route[-1]] = shortest_routes(planets, route[-1], transfer)
+            reachable = [(len(fromPlanet[route[-1]][planet]), planet) for planet in left
+                         if planet in fromPlanet[route[-1]]]
+            if not reachable:
+                break
+            _, nearest = min(reachable)
+            route = route + fromPlanet[route[-1]][nearest][1:]
+            left -= set(route)
+            candidates.append(route)
+    return candidates
+
+
+def assign_route(planets: dict, planet: str, routes: list, fleets: dict, assigned: dict, available: dict,
+                 transfer: str, fromPlanet: dict):
+    """ Give one fleet on a planet the route that lets it deliver the most of the flow pooled from the planet,
+    counting what it can unload on the way
+    :return: dict of the route given and the cargo it leaves room for, None if no fleet could be given a route
+    """
+    best = None
+    for route in candidate_routes(planets, routes, transfer, fromPlanet):
+        # everything pooled for a planet on this route can be unloaded on the way
+        onRoute = sum(amount for other, amount in routes if other[-1] in route)
+        for key, fleet in fleets.items():
+            if key[0] != planet or key in assigned:
+                continue
+            fuel = route_fuel(planets, fleet['costPerUnit'], route, transfer)
+            cargo, load = fleet_load(fleet, fuel)
+            if cargo <= 0 or load > available[planet]:
+                continue
+            value = (min(cargo, onRoute), -fuel, key)
+            if best is None or value > best[0]:
+                best = value, key, {'route': route, 'cargo': cargo, 'load': load}
+    if best is None:
+        return None
+    _, key, assignment = best
+    assigned[key] = assignment
+    # the fuel is loaded from the planet, so it can't also be sent
+    available[planet] -= assignment['load']
+    return assignment
+
+
+def cover_routes(routes: list, assignment: dict):
+    """ Take what a fleet given a route can carry off the pooled routes it unloads on
+    :param routes: list of (list of planets on the route, amount) pooled from the planet
+    :param assignment: route given to the fleet, from assign_route
+    :return: list of the routes with what is still pooled on them
+    """
+    room = assignment['cargo']
+    left = []
+    for route, amount in routes:
+        if route[-1] in assignment['route'] and room > 0:
+            taken = min(amount, room)
+            room -= taken
+            amount -= taken
+        if amount > EPSILON:
+            left.append((route, amount))
+    return left
+
+
+def plan_logistics(campaign: Commands, player: str, supply: dict, demand: dict, transfer: str = 'hohmann'):
+    """ Plan how to move resources from the planets that have them to the planets that need them as cheaply as
+    possible. Resources leave a planet in the player's fleets there, each fleet follows one route and can unload
+    at every planet on it, and every distance travelled costs the fuel of the fleet, loaded from the planet it
+    leaves on top of the cargo.
+    :param campaign: the campaign
+    :param player: player moving the resources
+    :param supply: dict of planet to the resources it can give
+    :param demand: dict of planet to the resources it needs
+    :param transfer: hohmann or brachistochrone, the transfer the fleets make
+    :return: dict with the orders to run now (loading fleets and sending them on the first hop), the route of
+             every fleet sent out with what it unloads where (list of (index on the route, planet, amount)),
+             the resources delivered and what could not be
+    """
+    planets = campaign.campaign['planets']
+    fleets = fleet_stats(campaign, player, supply, transfer)
+    available = {planet: planets[planet]['resources'][player] for planet in supply}
+    assigned = {}
+    fromPlanet = {}
+
+    # the min-cost flow over the pooled fleets picks where resources should go, then fleets on every planet are
+    # given the best routes until what is pooled from it is covered, and the flow is solved again with them. Each
+    # round is one solve, and rounds stop once the fleets with routes don't deliver more than the round before.
+    chained = -1
+    while True:
+        network = build_network(planets, supply, demand, fleets, assigned, available, transfer, True)
+        flow, _ = network.min_cost_flow('source', 'sink')
+        sent = {}
+        for (node, to), edgeFlow in network.flows().items():
+            sent.setdefault(node, {})[to] = edgeFlow
+        pooledRoutes = {planet: [(route, amount) for route, amount in split_routes(sent, planet) if len(route) > 1]
+                        for planet in sorted(supply)}
+        pooled = sum(amount for routes in pooledRoutes.values() for _, amount in routes)
+        if flow - pooled <= chained + EPSILON:
+            break
+        chained = flow - pooled
+        changed = False
+        for planet, routes in pooledRoutes.items():
+            while routes:
+                assignment = assign_route(planets, planet, routes, fleets, assigned, available, transfer,
+                                          fromPlanet)
+                if assignment is None:
+                    break
+                changed = True
+                routes = cover_routes(routes, assignment)
+        if not changed:
+            break
+
+    # the plan is the flow over the fleets with routes only, so it delivers exactly what the flow does
+    network = build_network(planets, supply, demand, fleets, assigned, available, transfer, False)
+    delivered, _ = network.min_cost_flow('source', 'sink')
+    sent = network.flows()
+    orders = []
+    routes = []
+    for key, assignment in sorted(assigned.items()):
+        planet, fleet = key
+        cargo = sent.get((('planet', planet), ('fleet', key, 0)), 0)
+        if cargo <= EPSILON:
+            continue
+        route = assignment['route']
+        # a route can go through a planet more than once, so unloads are kept by their place on the route
+        drops = [(index, stop, sent.get((('fleet', key, index), ('deliver', stop)), 0))
+                 for index, stop in enumerate(route)]
+        drops = [(index, stop, amount) for index, stop, amount in drops if amount > EPSILON]
+        if not drops:
+            continue
+        # the fleet only has to go as far as its last unload
+        route = route[:drops[-1][0] + 1]
+        fuel = route_fuel(planets, fleets[key]['costPerUnit'], route, transfer)
+        load = cargo + fleet_load(fleets[key], fuel)[1]
+        orders.append(('transfer_resources', (planet, load, player, planet, player, fleet)))
+        orders.append((f'{transfer}_fleet_transfer', (player, fleet, planet, route[1])))
+        routes.append({'fleet': fleet, 'route': route, 'cargo': cargo, 'fuel': fuel, 'drops': drops})
+    return {'orders': orders, 'routes': routes, 'delivered': delivered,
+            'undelivered': sum(amount for amount in demand.values() if amount > 0) - delivered}
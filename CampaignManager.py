@@ -0,0 +1,143 @@
+import shelve
+from collections import OrderedDict
+
+from CampaignSQLite import open_commands
+
+
+class ShipCatalog:
+    """ Ship class stats shared between every open campaign. Campaigns that register the same ship class
+    with the same stats point at one dict instead of a copy each, and a class is dropped from the catalog
+    once no open campaign uses it.
+    """
+
+    def __init__(self):
+        # (ship, points, resStorage, mass) -> [stats dict, number of open campaigns using it]
+        self.entries = {}
+
+    @staticmethod
+    def key(ship: str, stats: dict):
+        return ship, stats['points'], stats['resStorage'], stats['mass']
+
+    def acquire(self, ship: str, stats: dict):
+        """ Get the shared stats dict of a ship class, adding it to the catalog if it is new
+        :param ship: name of the ship class
+        :param stats: stats of the ship class in a campaign
+        :return: the shared dict with the same stats
+        """
+        entry = self.entries.setdefault(self.key(ship, stats), [stats, 0])
+        entry[1] += 1
+        return entry[0]
+
+    def release(self, ship: str, stats: dict):
+        """ Stop using a ship class in one campaign
+        :param ship: name of the ship class
+        :param stats: stats of the ship class in the campaign
+        :return: None
+        """
+        key = self.key(ship, stats)
+        if key in self.entries:
+            self.entries[key][1] -= 1
+            if self.entries[key][1] <= 0:
+                del self.entries[key]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class CampaignManager:
+    """ Hosts many campaigns on one machine by keeping only the most recently used ones open. Opening one more
+    than the capacity writes out and closes the campaign that was used longest ago, and it is opened again
+    the next time it is asked for.
+    """
+
+    def __init__(self, capacity: int = 8, opener=open_commands):
+        self.capacity = capacity
+        self.opener = opener
+        # save path -> Commands, from least to most recently used
+        self.campaigns = OrderedDict()
+        # save path -> {ship: stats} of the ship classes it holds from the catalog
+        self.shipsUsed = {}
+        # save path -> the listener keeping its ship classes in the catalog
+        self.listeners = {}
+        self.catalog = ShipCatalog()
+
+    def __contains__(self, file: str):
+        return file in self.campaigns
+
+    def __len__(self):
+        return len(self.campaigns)
+
+    def get(self, file: str):
+        """ Get the campaign of a save, opening it if it isn't open already
+        :param file: path of the save
+        :return: Commands of the campaign
+        """
+        if file in self.campaigns:
+            self.campaigns.move_to_end(file)
+            return self.campaigns[file]
+
+        while len(self.campaigns) >= self.capacity:
+            self.close(next(iter(self.campaigns)))
+        campaign = self.opener(file)
+        self.campaigns[file] = campaign
+        self.share_ships(file)
+
+        def handle_event(event: str, details: dict):
+            if event == 'ship_registered':
+                self.share_ship(file, details['ship'])
+            elif event == 'campaign_loaded':
+                self.share_ships(file)
+
+        campaign.add_listener(handle_event)
+        self.listeners[file] = handle_event
+        return campaign
+
+    def shared_ships(self, file: str):
+        # only shelve saves hold their ship classes in memory, SQLite reads them from the database when asked
+        campaign = self.campaigns[file].campaign
+        if not isinstance(campaign, shelve.Shelf) or 'ships' not in campaign:
+            return None
+        return campaign['ships']
+
+    def share_ships(self, file: str):
+        """ Point every ship class of a campaign at the shared stats in the catalog
+        :param file: path of the save
+        :return: None
+        """
+        self.release_ships(file)
+        self.shipsUsed[file] = {}
+        for ship in list(self.shared_ships(file) or ()):
+            self.share_ship(file, ship)
+
+    def share_ship(self, file: str, ship: str):
+        ships = self.shared_ships(file)
+        if ships is None:
+            return
+        used = self.shipsUsed[file]
+        if ship in used:
+            # the ship class was registered again, maybe with new stats
+            self.catalog.release(ship, used[ship])
+        used[ship] = ships[ship] = self.catalog.acquire(ship, ships[ship])
+
+    def release_ships(self, file: str):
+        for ship, stats in self.shipsUsed.pop(file, {}).items():
+            self.catalog.release(ship, stats)
+
+    def close(self, file: str):
+        """ Write out and close an open campaign
+        :param file: path of the save
+        :return: None
+        """
+        if file not in self.campaigns:
+            return
+        self.release_ships(file)
+        campaign = self.campaigns.pop(file)
+        campaign.remove_listener(self.listeners.pop(file))
+        campaign.close_campaign()
+
+    def close_all(self):
+        """ Write out and close every open campaign
+        :return: None
+        """
+        for file in list(self.campaigns):
+            self.close(file)
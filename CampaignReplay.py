@@ -0,0 +1,231 @@
+import argparse
+import importlib
+import io
+import math
+import os
+import random
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from CampaignCommands import Commands
+
+FACTIONS = ('HDC', 'PC', 'Neutral')
+
+
+def apply_order(campaign, order: tuple):
+    """ Run an order against a campaign
+    :param campaign: Commands, or any engine with the same methods
+    :param order: tuple of the method name and a tuple of its arguments
+    :return: None
+    """
+    method, args = order
+    getattr(campaign, method)(*args)
+
+
+def generate_orders(seed: int, steps: int = 200, planets: int = 12, players: int = 6, ships: int = 4):
+    """ Generate a random but valid stream of orders. The stream is built by running it against a scratch
+    reference campaign, so every order is picked from what is actually possible at that point.
+    :param seed: random seed, the same seed always gives the same stream
+    :param steps: number of orders after the campaign is set up
+    :param planets: number of planets on the generated map
+    :param players: number of players
+    :param ships: number of ship classes
+    :return: list of orders, tuples of the method name and a tuple of its arguments
+    """
+    rng = random.Random(seed)
+    orders = [('init_campaign', ())]
+
+    planetNames = [f'Planet{i}' for i in range(planets)]
+    for planet in planetNames:
+        faction = rng.choice(FACTIONS)
+        orders.append(('add_planet', (planet, rng.randrange(1, 20) * 50, faction, faction)))
+    # a random tree so every planet can be reached, then a few extra connections
+    for i in range(1, planets):
+        orders.append(('add_connection', (planetNames[i], planetNames[rng.randrange(i)], rng.randint(1, 6))))
+    for _ in range(planets // 2):
+        planet1, planet2 = rng.sample(planetNames, 2)
+        orders.append(('add_connection', (planet1, planet2, rng.randint(1, 6))))
+    for i in range(players):
+        orders.append(('add_player', (f'Player{i}', FACTIONS[i % 2])))
+    for i in range(ships):
+        orders.append(('add_ship_to_campaign', (f'Ship{i}', rng.randint(1, 10) * 25, rng.randint(0, 8) * 50,
+                                                rng.randint(1, 10) * 10)))
+
+    with tempfile.TemporaryDirectory() as directory, redirect_stdout(io.StringIO()):
+        scratch = Commands(os.path.join(directory, 'scratch'))
+        for order in orders:
+            apply_order(scratch, order)
+
+        fleetNumber = 0
+        setupLength = len(orders)
+        while len(orders) < setupLength + steps:
+            order = random_order(rng, scratch.campaign, fleetNumber)
+            if order is None:
+                continue
+            if order[0] == 'make_fleet':
+                fleetNumber += 1
+            run_turn(scratch, order)
+            orders.append(order)
+        scratch.close_campaign()
+    return orders
+
+
+def random_order(rng: random.Random, campaign, fleetNumber: int):
+    """ Pick a random order that is valid in the current state of a campaign
+    :return: order tuple, or None if the picked kind of order isn't possible right now
+    """
+    planets = campaign['planets']
+    players = campaign['players']
+    shipClasses = campaign['ships']
+    player = rng.choice(list(players))
+    planet = rng.choice(list(planets))
+    localPlanet = planets[planet]
+    kind = rng.choices(('cheat_in_resources', 'cheat_in_ship', 'make_ship', 'scrap_ship', 'void_ship',
+                        'void_resources', 'make_fleet', 'disband_fleet', 'load_fleet', 'move_fleet', 'turn_fleet',
+                        'turn'),
+                       (6, 5, 6, 2, 1, 1, 5, 2, 5, 6, 1, 3))[0]
+
+    if kind == 'cheat_in_resources':
+        return kind, (planet, player, rng.randint(1, 40) * 50)
+    if kind == 'cheat_in_ship':
+        return kind, (planet, player, rng.choice(list(shipClasses)), rng.randint(1, 5))
+    if kind == 'make_ship':
+        if players[player]['faction'] != localPlanet['factionControl']:
+            return None
+        ship = rng.choice(list(shipClasses))
+        affordable = int(localPlanet['resources'][player] // shipClasses[ship]['points'])
+        if affordable < 1:
+            return None
+        return kind, (planet, player, ship, rng.randint(1, affordable))
+    if kind in ('scrap_ship', 'void_ship'):
+        localShips = localPlanet['ships'][player]
+        if not localShips:
+            return None
+        ship = rng.choice(list(localShips))
+        return kind, (planet, player, ship, rng.randint(1, localShips[ship]))
+    if kind == 'void_resources':
+        if localPlanet['resources'][player] < 1:
+            return None
+        return kind, (planet, player, rng.randint(1, int(localPlanet['resources'][player])))
+    if kind == 'make_fleet':
+        localShips = localPlanet['ships'][player]
+        if not localShips:
+            return None
+        chosen = rng.sample(list(localShips), rng.randint(1, len(localShips)))
+        return kind, (planet, player, f'Fleet{fleetNumber}', {ship: rng.randint(1, localShips[ship]) for ship in chosen})
+
+    # the rest of the orders need a fleet sitting on a planet
+    fleets = [(fleetPlanet, fleet) for fleetPlanet in planets for fleet in planets[fleetPlanet]['fleets'][player]]
+    if kind == 'turn_fleet':
+        if not players[player]['transits']:
+            return None
+        return kind, (player, rng.choice(list(players[player]['transits'])))
+    if kind == 'turn':
+        return 'end_turn', ()
+    if not fleets:
+        return None
+    fleetPlanet, fleet = rng.choice(fleets)
+    if kind == 'disband_fleet':
+        return kind, (fleetPlanet, player, fleet)
+    if kind == 'load_fleet':
+        available = planets[fleetPlanet]['resources'][player]
+        if available < 1:
+            return None
+        return 'transfer_resources', (fleetPlanet, rng.randint(1, int(available)), player, fleetPlanet, player, fleet)
+    # move_fleet
+    planetTo = rng.choice(list(planets[fleetPlanet]['connections']))
+    transfer = rng.choice(('hohmann_fleet_transfer', 'brachistochrone_fleet_transfer'))
+    return transfer, (player, fleet, fleetPlanet, planetTo)
+
+
+def first_difference(reference, candidate, path: str = ''):
+    """ Find the first place two campaign states differ
+    :return: path of the difference, or None if they are the same
+    """
+    if isinstance(reference, dict) and isinstance(candidate, dict):
+        for key in reference.keys() | candidate.keys():
+            if key not in reference or key not in candidate:
+                return f'{path}/{key} (missing from {"reference" if key not in reference else "candidate"})'
+            difference = first_difference(reference[key], candidate[key], f'{path}/{key}')
+            if difference:
+                return difference
+        return None
+    if isinstance(reference, (int, float)) and isinstance(candidate, (int, float)):
+        return None if math.isclose(reference, candidate, abs_tol=1e-9) else f'{path} ({reference} != {candidate})'
+    return None if reference == candidate else f'{path} ({reference!r} != {candidate!r})'
+
+
+def run_turn(campaign, order: tuple):
+    # a turn order ends the turn and starts the next one, like the GM does
+    apply_order(campaign, order)
+    if order[0] == 'end_turn':
+        campaign.start_turn()
+
+
+def compare_engines(orders: list, candidateFactory, referenceFactory=Commands, stopAtFirst: bool = True):
+    """ Replay an order stream through a reference and a candidate engine, comparing the full state after every step
+    :param orders: order stream from generate_orders
+    :param candidateFactory: callable taking a save path and returning the engine to check
+    :param referenceFactory: callable taking a save path and returning the reference engine
+    :param stopAtFirst: stop at the first step the states differ
+    :return: dict with the steps replayed, the mismatches found, the time each engine took and the speedup
+    """
+    result = {'steps': 0, 'mismatches': [], 'referenceTime': 0.0, 'candidateTime': 0.0}
+    with tempfile.TemporaryDirectory() as directory, redirect_stdout(io.StringIO()):
+        reference = referenceFactory(os.path.join(directory, 'reference'))
+        candidate = candidateFactory(os.path.join(directory, 'candidate'))
+
+        for step, order in enumerate(orders):
+            # only the orders themselves are timed, not the state comparison,
+            # and which engine goes first alternates so neither gets the warm caches
+            engines = [('referenceTime', reference), ('candidateTime', candidate)]
+            for timeKey, engine in engines if step % 2 == 0 else reversed(engines):
+                start = time.perf_counter()
+                run_turn(engine, order)
+                result[timeKey] += time.perf_counter() - start
+
+            result['steps'] += 1
+            difference = first_difference(reference.snapshot(), candidate.snapshot())
+            if difference:
+                result['mismatches'].append({'step': step, 'order': order, 'difference': difference})
+                if stopAtFirst:
+                    break
+
+        reference.close_campaign()
+        candidate.close_campaign()
+
+    result['speedup'] = result['referenceTime'] / result['candidateTime'] if result['candidateTime'] else float('inf')
+    return result
+
+
+def load_engine(path: str):
+    # engines are given as module:Class, the class is called with the save path
+    moduleName, className = path.split(':')
+    return getattr(importlib.import_module(moduleName), className)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay random order streams through the reference Commands and '
+                                                 'another engine, comparing the state after every step')
+    parser.add_argument('engine', help='engine to check as module:Class, for example CampaignCommands:Commands')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first run')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--steps', type=int, default=300)
+    parser.add_argument('--planets', type=int, default=12)
+    parser.add_argument('--players', type=int, default=6)
+    args = parser.parse_args()
+
+    engine = load_engine(args.engine)
+    failed = False
+    for seed in range(args.seed, args.seed + args.runs):
+        stream = generate_orders(seed, args.steps, args.planets, args.players)
+        result = compare_engines(stream, engine)
+        if result['mismatches']:
+            failed = True
+            mismatch = result['mismatches'][0]
+            print(f"Seed {seed}: state differs after step {mismatch['step']} {mismatch['order']} at "
+                  f"{mismatch['difference']}")
+        else:
+            print(f"Seed {seed}: {result['steps']} steps match, speedup {result['speedup']:.2f}x")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,180 @@
+import hashlib
+import os
+import re
+from multiprocessing import Pool
+
+from CampaignCommands import Commands, find_battles
+
+# snapshot a report worker builds its reports from, set once per worker process
+workerSnapshot = None
+
+# planets x players below which starting worker processes takes longer than building every report here
+PARALLEL_MIN_WORK = 20000
+
+
+def build_player_reports(snapshot: dict, players=None):
+    """ Split a campaign snapshot into the data each player's turn report needs, in one pass over the planets
+    :param snapshot: campaign snapshot from Commands.snapshot
+    :param players: names of the players to build reports for, None for every player
+    :return: dict of player names to report dicts
+    """
+    if players is None:
+        players = snapshot['players']
+    reports = {}
+    for player in players:
+        localPlayer = snapshot['players'][player]
+        reports[player] = {'player': player, 'faction': localPlayer['faction'], 'turn': snapshot['turn'],
+                           'holdings': [], 'income': 0, 'transits': [], 'battles': []}
+        for fleet, transit in localPlayer['transits'].items():
+            distance = snapshot['planets'][transit['planetFrom']]['connections'][transit['planetTo']]
+            reports[player]['transits'].append({'fleet': fleet, 'planetFrom': transit['planetFrom'],
+                                                'planetTo': transit['planetTo'], 'transitType': transit['transitType'],
+                                                'progress': transit['progress'], 'distance': distance,
+                                                'resources': transit['fleet']['resources'],
+                                                'ships': transit['fleet']['ships']})
+
+    for planet, localPlanet in snapshot['planets'].items():
+        for player, report in reports.items():
+            # income is paid to every player of the faction controlling the planet
+            if report['faction'] == localPlanet['factionControl']:
+                report['income'] += localPlanet['value']
+
+            resources = localPlanet['resources'][player]
+            ships = localPlanet['ships'][player]
+            fleets = localPlanet['fleets'][player]
+            production = localPlanet['production'][player]
+            if resources or ships or fleets or production:
+                report['holdings'].append({'planet': planet, 'resources': resources, 'ships': ships,
+                                           'fleets': fleets, 'production': production})
+
+    for planet, factionsOnPlanet in find_battles(snapshot['planets'], snapshot['players']).items():
+        for report in reports.values():
+            if report['faction'] in factionsOnPlanet:
+                report['battles'].append({'planet': planet, 'factions': factionsOnPlanet})
+
+    return reports
+
+
+def render_report(report: dict):
+    """ Render a player's report as text
+    :param report: report dict from build_player_reports
+    :return: tuple of the player name and the report text
+    """
+    lines = [f"Turn {report['turn']} report for {report['player']} ({report['faction']})",
+             f"Income next turn: {report['income']}", '']
+
+    lines.append('Holdings:')
+    for holding in report['holdings']:
+        lines.append(f"  {holding['planet']}: {holding['resources']} resources")
+        for shipName, shipAmount in holding['ships'].items():
+            lines.append(f'    {shipName} (x{shipAmount})')
+        for fleet, localFleet in holding['fleets'].items():
+            lines.append(f"    Fleet {fleet}: {localFleet['resources']} resources")
+            for shipName, shipAmount in localFleet['ships'].items():
+                lines.append(f'      {shipName} (x{shipAmount})')
+        for shipName, shipAmount in holding['production'].items():
+            lines.append(f'    Producing {shipName} (x{shipAmount})')
+    if not report['holdings']:
+        lines.append('  None')
+
+    lines.append('')
+    lines.append('Transits:')
+    for transit in report['transits']:
+        lines.append(f"  Fleet {transit['fleet']} ({transit['transitType']}) from {transit['planetFrom']} to "
+                     f"{transit['planetTo']}, Progress: {transit['progress']}/{transit['distance']}, "
+                     f"{transit['resources']} resources")
+        for shipName, shipAmount in transit['ships'].items():
+            lines.append(f'    {shipName} (x{shipAmount})')
+    if not report['transits']:
+        lines.append('  None')
+
+    lines.append('')
+    lines.append('Battles:')
+    for battle in report['battles']:
+        lines.append(f"  Battle on {battle['planet']} between {', '.join(battle['factions'])}")
+        for faction, factionShips in battle['factions'].items():
+            lines.append(f'    Ships for {faction}:')
+            for shipName, shipAmount in factionShips.items():
+                lines.append(f'      {shipName} (x{shipAmount})')
+    if not report['battles']:
+        lines.append('  None')
+
+    return report['player'], '\n'.join(lines) + '\n'
+
+
+def init_worker(snapshot: dict):
+    global workerSnapshot
+    workerSnapshot = snapshot
+
+
+def build_and_render(players: list):
+    """ Build and render the reports of some players in a worker, from the snapshot it was started with
+    :param players: names of the players
+    :return: list of tuples of the player name and the report text
+    """
+    return [render_report(report) for report in build_player_reports(workerSnapshot, players).values()]
+
+
+def report_paths(directory: str, turn: int, players):
+    """ Get the file each player's report is written to
+    :param directory: directory of the reports
+    :param turn: turn of the reports
+    :param players: names of the players
+    :return: dict of player names to file paths, a different file for every player
+    """
+    # keep player names usable as file names
+    safeNames = {player: re.sub(r'[^\w\-]+', '_', player) for player in players}
+    used = {}
+    for safeName in safeNames.values():
+        used[safeName] = used.get(safeName, 0) + 1
+    paths = {}
+    for player, safeName in safeNames.items():
+        # players whose names only differ in the characters replaced ("A B" and "A_B") get a hash of the name
+        if used[safeName] > 1:
+            safeName += '_' + hashlib.sha1(player.encode()).hexdigest()[:8]
+        paths[player] = os.path.join(directory, f'turn{turn}_{safeName}.txt')
+    return paths
+
+
+def write_reports(campaign: Commands, directory: str, processes: int = None):
+    """ Write a turn report for every player from one snapshot of the campaign. The players are split between
+    worker processes, each building and rendering the reports of its players, so the time taken stays flat as
+    players are added as long as there are CPUs for them.
+    :param campaign: campaign to report on
+    :param directory: directory the reports are written to, one file per player
+    :param processes: number of worker processes, None for one per CPU (or none for a small campaign), 1 to build
+                      the reports in this process
+    :return: list of the written file paths
+    """
+    snapshot = campaign.snapshot()
+    players = list(snapshot['players'])
+    os.makedirs(directory, exist_ok=True)
+    playerPaths = report_paths(directory, snapshot['turn'], players)
+
+    paths = []
+
+    def write(player, text):
+        path = playerPaths[player]
+        with open(path, 'w') as file:
+            file.write(text)
+        paths.append(path)
+
+    if processes is None:
+        processes = 1
+        if len(snapshot['planets']) * len(players) >= PARALLEL_MIN_WORK:
+            processes = os.cpu_count() or 1
+    if processes == 1 or len(players) <= 1:
+        for report in build_player_reports(snapshot).values():
+            write(*render_report(report))
+    else:
+        # every worker gets the snapshot once when it starts and then a share of the players, and reports are
+        # written out as soon as a share is done
+        processes = min(processes, len(players))
+        shares = [players[index::processes] for index in range(processes)]
+        with Pool(processes, init_worker, (snapshot,)) as pool:
+            for rendered in pool.imap_unordered(build_and_render, shares):
+                for player, text in rendered:
+                    write(player, text)
+
+    print(f"Wrote {len(paths)} reports for turn {snapshot['turn']} to {directory}")
+    return paths
@@ -0,0 +1,850 @@
+import sqlite3
+from collections.abc import Mapping
+
+from CampaignCommands import Commands
+
+# amounts are declared without a type so ints stay ints and floats (scrap ratio, fuel) stay floats,
+# exactly like the shelve campaign
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+CREATE TABLE IF NOT EXISTS planets (name TEXT PRIMARY KEY, value, factionControl TEXT, factionAllegiance TEXT);
+CREATE INDEX IF NOT EXISTS planets_control ON planets (factionControl);
+CREATE TABLE IF NOT EXISTS connections (planet TEXT, other TEXT, distance, PRIMARY KEY (planet, other));
+CREATE TABLE IF NOT EXISTS players (name TEXT PRIMARY KEY, faction TEXT, position INTEGER);
+CREATE INDEX IF NOT EXISTS players_faction ON players (faction);
+CREATE TABLE IF NOT EXISTS ship_classes (name TEXT PRIMARY KEY, points, resStorage, mass);
+CREATE TABLE IF NOT EXISTS holdings (planet TEXT, player TEXT, resources, PRIMARY KEY (planet, player));
+CREATE INDEX IF NOT EXISTS holdings_player ON holdings (player);
+CREATE TABLE IF NOT EXISTS planet_ships (planet TEXT, player TEXT, ship TEXT, amount, PRIMARY KEY (planet, player, ship));
+CREATE INDEX IF NOT EXISTS planet_ships_player ON planet_ships (player);
+CREATE TABLE IF NOT EXISTS fleets (id INTEGER PRIMARY KEY, player TEXT, name TEXT, planet TEXT, resources);
+CREATE INDEX IF NOT EXISTS fleets_player ON fleets (player, name);
+CREATE INDEX IF NOT EXISTS fleets_planet ON fleets (planet);
+CREATE TABLE IF NOT EXISTS fleet_ships (fleet INTEGER, ship TEXT, amount, PRIMARY KEY (fleet, ship));
+CREATE TABLE IF NOT EXISTS transits (fleet INTEGER PRIMARY KEY, player TEXT, name TEXT, planetFrom TEXT,
+                                     planetTo TEXT, transitType TEXT, progress, costPerUnit, position INTEGER);
+CREATE INDEX IF NOT EXISTS transits_player ON transits (player, name);
+CREATE TABLE IF NOT EXISTS production (planet TEXT, player TEXT, ship TEXT, amount, PRIMARY KEY (planet, player, ship));
+CREATE INDEX IF NOT EXISTS production_player ON production (player);
+'''
+
+MISSING_FIELD = 'Some field (planet or player) does not exist, did you misspell anything?'
+MISSING_FIELD_FLEET = 'Some field (planet / player/ fleet) does not exist, did you misspell anything?'
+
+
+class SQLiteTable(Mapping):
+    """ Read-only dict view of one kind of entity in the database, each entity is only loaded when looked up """
+
+    def __init__(self, db: sqlite3.Connection, table: str, loader):
+        self.db = db
+        self.table = table
+        self.loader = loader
+
+    def __getitem__(self, name):
+        return self.loader(name)
+
+    def __contains__(self, name):
+        return self.db.execute(f'SELECT 1 FROM {self.table} WHERE name = ?', (name,)).fetchone() is not None
+
+    def __iter__(self):
+        order = ' ORDER BY position' if self.table == 'players' else ''
+        return iter([row[0] for row in self.db.execute(f'SELECT name FROM {self.table}{order}')])
+
+    def __len__(self):
+        return self.db.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+
+
+class SQLiteCampaign(Mapping):
+    """ Read-only stand in for the campaign shelve, so code that reads the nested dicts (get_details,
+    the visibility cache, the auditor) works unchanged on the database
+    """
+
+    def __init__(self, commands):
+        self.commands = commands
+        db = commands.db
+        self.tables = {'planets': SQLiteTable(db, 'planets', commands.planet_dict),
+                       'players': SQLiteTable(db, 'players', commands.player_dict),
+                       'ships': SQLiteTable(db, 'ship_classes', commands.ship_dict)}
+
+    def __getitem__(self, key):
+        if key == 'turn':
+            return self.commands.get_turn()
+        return self.tables[key]
+
+    def __iter__(self):
+        return iter(('planets', 'players', 'ships', 'turn'))
+
+    def __len__(self):
+        return 4
+
+    def sync(self):
+        self.commands.db.commit()
+
+    def close(self):
+        self.commands.close_campaign()
+
+
+class SQLiteCommands(Commands):
+    """ Commands stored in normalised sqlite3 tables instead of a shelve. Every command runs in one
+    transaction and only touches the rows it needs. The rules, including their quirks, are the same as
+    Commands so both can be checked against each other with CampaignReplay.
+    """
+
+    def __init__(self, file: str, readOnly: bool = False):
+        self.file = file
+        self.readOnly = readOnly
+        self.scrapRatio = 0.5
+        self.resourceGenerationRatio = 10
+        self.brachistochroneMassRatio = 15
+        self.hohmannMassRatio = 30
+        self.listeners = []
+        self.db = None
+        self.open_campaign(file)
+
+    @property
+    def campaign(self):
+        return SQLiteCampaign(self)
+
+    def open_campaign(self, file: str):
+        if self.db is not None:
+            self.db.close()
+        self.file = file
+        if self.readOnly:
+            self.db = sqlite3.connect(f'file:{file}?mode=ro', uri=True, check_same_thread=False)
+        else:
+            self.db = sqlite3.connect(file, check_same_thread=False)
+            # write-ahead logging lets queries read the database while a command is writing to it
+            self.db.execute('PRAGMA journal_mode = WAL')
+            self.db.execute('PRAGMA synchronous = NORMAL')
+            self.db.executescript(SCHEMA)
+        self.notify('campaign_loaded')
+
+    def close_campaign(self):
+        """ Commits and closes the database
+        :return: None
+        """
+        if self.db is not None:
+            self.db.commit()
+            self.db.close()
+            self.db = None
+
+    def init_campaign(self):
+        """ Initializes a campaign by setting the turn count if there isn't one yet
+        :return: None
+        """
+        with self.db:
+            self.db.execute("INSERT OR IGNORE INTO meta VALUES ('turn', 0)")
+
+    # reading helpers
+
+    def get_turn(self):
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'turn'").fetchone()
+        if row is None:
+            raise KeyError('turn')
+        return row[0]
+
+    def planet_exists(self, planet: str):
+        return self.db.execute('SELECT 1 FROM planets WHERE name = ?', (planet,)).fetchone() is not None
+
+    def on_planet(self, planet: str, player: str):
+        # a player is listed on a planet when it has a holdings row there, like the per-player dicts of a planet
+        return self.db.execute('SELECT 1 FROM holdings WHERE planet = ? AND player = ?',
+                               (planet, player)).fetchone() is not None
+
+    def get_faction(self, player: str):
+        row = self.db.execute('SELECT faction FROM players WHERE name = ?', (player,)).fetchone()
+        if row is None:
+            raise KeyError(player)
+        return row[0]
+
+    def get_points(self, ship: str):
+        row = self.db.execute('SELECT points FROM ship_classes WHERE name = ?', (ship,)).fetchone()
+        if row is None:
+            raise KeyError(ship)
+        return row[0]
+
+    def get_resources(self, planet: str, player: str):
+        row = self.db.execute('SELECT resources FROM holdings WHERE planet = ? AND player = ?',
+                              (planet, player)).fetchone()
+        if row is None:
+            raise KeyError(player)
+        return row[0]
+
+    def add_resources(self, planet: str, player: str, amount):
+        self.db.execute('UPDATE holdings SET resources = resources + ? WHERE planet = ? AND player = ?',
+                        (amount, planet, player))
+
+    def get_ship_amount(self, planet: str, player: str, ship: str):
+        row = self.db.execute('SELECT amount FROM planet_ships WHERE planet = ? AND player = ? AND ship = ?',
+                              (planet, player, ship)).fetchone()
+        return None if row is None else row[0]
+
+    def add_ships(self, planet: str, player: str, ship: str, amount):
+        if self.get_ship_amount(planet, player, ship) is None:
+            self.db.execute('INSERT INTO planet_ships VALUES (?, ?, ?, ?)', (planet, player, ship, amount))
+        else:
+            self.db.execute('UPDATE planet_ships SET amount = amount + ? WHERE planet = ? AND player = ? AND ship = ?',
+                            (amount, planet, player, ship))
+
+    def remove_ships(self, planet: str, player: str, ship: str, amount):
+        # the entry is removed when exactly all the ships are taken, like the shelve campaign
+        if self.get_ship_amount(planet, player, ship) == amount:
+            self.db.execute('DELETE FROM planet_ships WHERE planet = ? AND player = ? AND ship = ?',
+                            (planet, player, ship))
+        else:
+            self.db.execute('UPDATE planet_ships SET amount = amount - ? WHERE planet = ? AND player = ? AND ship = ?',
+                            (amount, planet, player, ship))
+
+    def get_distance(self, planetFrom: str, planetTo: str):
+        row = self.db.execute('SELECT distance FROM connections WHERE planet = ? AND other = ?',
+                              (planetFrom, planetTo)).fetchone()
+        return None if row is None else row[0]
+
+    def fleet_id(self, planet: str, player: str, fleet: str):
+        row = self.db.execute('SELECT id FROM fleets WHERE planet = ? AND player = ? AND name = ?',
+                              (planet, player, fleet)).fetchone()
+        return None if row is None else row[0]
+
+    def fleet_resources(self, fleetId: int):
+        return self.db.execute('SELECT resources FROM fleets WHERE id = ?', (fleetId,)).fetchone()[0]
+
+    def fleet_ships(self, fleetId: int):
+        return dict(self.db.execute('SELECT ship, amount FROM fleet_ships WHERE fleet = ?', (fleetId,)))
+
+    def fleet_dict(self, fleetId: int):
+        return {'resources': self.fleet_resources(fleetId), 'ships': self.fleet_ships(fleetId)}
+
+    def delete_fleet(self, fleetId: int):
+        self.db.execute('DELETE FROM fleet_ships WHERE fleet = ?', (fleetId,))
+        self.db.execute('DELETE FROM transits WHERE fleet = ?', (fleetId,))
+        self.db.execute('DELETE FROM fleets WHERE id = ?', (fleetId,))
+
+    def transit_row(self, player: str, fleet: str):
+        return self.db.execute('SELECT fleet, planetFrom, planetTo, transitType, progress, costPerUnit FROM transits '
+                               'WHERE player = ? AND name = ?', (player, fleet)).fetchone()
+
+    # dicts in the same layout as the shelve campaign
+
+    def planet_dict(self, planet: str):
+        row = self.db.execute('SELECT value, factionControl, factionAllegiance FROM planets WHERE name = ?',
+                              (planet,)).fetchone()
+        if row is None:
+            raise KeyError(planet)
+        resources = dict(self.db.execute('SELECT player, resources FROM holdings WHERE planet = ?', (planet,)))
+        localPlanet = {'value': row[0], 'factionControl': row[1], 'factionAllegiance': row[2],
+                       'connections': dict(self.db.execute('SELECT other, distance FROM connections WHERE planet = ?',
+                                                           (planet,))),
+                       'resources': resources, 'ships': {player: {} for player in resources},
+                       'fleets': {player: {} for player in resources},
+                       'production': {player: {} for player in resources}}
+        for player, ship, amount in self.db.execute('SELECT player, ship, amount FROM planet_ships WHERE planet = ?',
+                                                    (planet,)):
+            localPlanet['ships'][player][ship] = amount
+        for player, ship, amount in self.db.execute('SELECT player, ship, amount FROM production WHERE planet = ?',
+                                                    (planet,)):
+            localPlanet['production'][player][ship] = amount
+        for fleetId, player, fleet in self.db.execute('SELECT id, player, name FROM fleets WHERE planet = ?',
+                                                      (planet,)).fetchall():
+            localPlanet['fleets'][player][fleet] = self.fleet_dict(fleetId)
+        return localPlanet
+
+    def player_dict(self, player: str):
+        faction = self.get_faction(player)
+        transits = {}
+        for fleetId, fleet, planetFrom, planetTo, transitType, progress, costPerUnit in self.db.execute(
+                'SELECT fleet, name, planetFrom, planetTo, transitType, progress, costPerUnit FROM transits '
+                'WHERE player = ? ORDER BY position', (player,)).fetchall():
+            transits[fleet] = {'planetFrom': planetFrom, 'planetTo': planetTo, 'transitType': transitType,
+                               'progress': progress, 'costPerUnit': costPerUnit, 'fleet': self.fleet_dict(fleetId)}
+        return {'faction': faction, 'transits': transits}
+
+    def ship_dict(self, ship: str):
+        row = self.db.execute('SELECT points, resStorage, mass FROM ship_classes WHERE name = ?', (ship,)).fetchone()
+        if row is None:
+            raise KeyError(ship)
+        return {'points': row[0], 'resStorage': row[1], 'mass': row[2]}
+
+    def snapshot(self):
+        """ Make a detached copy of the whole campaign in the same layout as the shelve campaign,
+        reading every table once
+        :return: dict with the planets, players, ships and turn of the campaign
+        """
+        db = self.db
+        fleets = {}
+        for fleetId, resources in db.execute('SELECT id, resources FROM fleets'):
+            fleets[fleetId] = {'resources': resources, 'ships': {}}
+        for fleetId, ship, amount in db.execute('SELECT fleet, ship, amount FROM fleet_ships'):
+            fleets[fleetId]['ships'][ship] = amount
+
+        planets = {}
+        for name, value, factionControl, factionAllegiance in db.execute('SELECT * FROM planets'):
+            planets[name] = {'value': value, 'factionControl': factionControl,
+                             'factionAllegiance': factionAllegiance, 'connections': {}, 'resources': {},
+                             'ships': {}, 'fleets': {}, 'production': {}}
+        for planet, other, distance in db.execute('SELECT planet, other, distance FROM connections'):
+            planets[planet]['connections'][other] = distance
+        for planet, player, resources in db.execute('SELECT planet, player, resources FROM holdings'):
+            localPlanet = planets[planet]
+            localPlanet['resources'][player] = resources
+            localPlanet['ships'][player] = {}
+            localPlanet['fleets'][player] = {}
+            localPlanet['production'][player] = {}
+        for planet, player, ship, amount in db.execute('SELECT planet, player, ship, amount FROM planet_ships'):
+            planets[planet]['ships'][player][ship] = amount
+        for planet, player, ship, amount in db.execute('SELECT planet, player, ship, amount FROM production'):
+            planets[planet]['production'][player][ship] = amount
+        for fleetId, player, name, planet in db.execute('SELECT id, player, name, planet FROM fleets '
+                                                        'WHERE planet IS NOT NULL'):
+            planets[planet]['fleets'][player][name] = fleets[fleetId]
+
+        players = {name: {'faction': faction, 'transits': {}}
+                   for name, faction in db.execute('SELECT name, faction FROM players ORDER BY position')}
+        for fleetId, player, name, planetFrom, planetTo, transitType, progress, costPerUnit in db.execute(
+                'SELECT fleet, player, name, planetFrom, planetTo, transitType, progress, costPerUnit FROM transits '
+                'ORDER BY position'):
+            players[player]['transits'][name] = {'planetFrom': planetFrom, 'planetTo': planetTo,
+                                                 'transitType': transitType, 'progress': progress,
+                                                 'costPerUnit': costPerUnit, 'fleet': fleets[fleetId]}
+
+        ships = {name: {'points': points, 'resStorage': resStorage, 'mass': mass}
+                 for name, points, resStorage, mass in db.execute('SELECT * FROM ship_classes')}
+        snapshot = {'planets': planets, 'players': players, 'ships': ships}
+        turn = db.execute("SELECT value FROM meta WHERE key = 'turn'").fetchone()
+        if turn is not None:
+            snapshot['turn'] = turn[0]
+        return snapshot
+
+    # commands
+
+    def add_planet(self, planet: str, value: int, factionControl: str, factionAllegiance: str):
+        with self.db:
+            # re-adding a planet replaces it, everything on it is lost
+            self.reset_planet(planet)
+            self.db.execute('INSERT OR REPLACE INTO planets VALUES (?, ?, ?, ?)',
+                            (planet, value, factionControl, factionAllegiance))
+            self.db.execute('INSERT INTO holdings SELECT ?, name, 0 FROM players', (planet,))
+        print(f"Planet {planet} added")
+        self.notify('planet_added', planet=planet, value=value, factionControl=factionControl,
+                    factionAllegiance=factionAllegiance)
+
+    def reset_planet(self, planet: str):
+        for (fleetId,) in self.db.execute('SELECT id FROM fleets WHERE planet = ?', (planet,)).fetchall():
+            self.delete_fleet(fleetId)
+        for table in ('holdings', 'planet_ships', 'production'):
+            self.db.execute(f'DELETE FROM {table} WHERE planet = ?', (planet,))
+        # only the connections from this planet are reset, the other planets still list it
+        self.db.execute('DELETE FROM connections WHERE planet = ?', (planet,))
+
+    def add_connection(self, planet1: str, planet2: str, distance: int):
+        with self.db:
+            if self.planet_exists(planet1):
+                self.db.execute('INSERT OR REPLACE INTO connections VALUES (?, ?, ?)', (planet1, planet2, distance))
+                if self.planet_exists(planet2):
+                    self.db.execute('INSERT OR REPLACE INTO connections VALUES (?, ?, ?)',
+                                    (planet2, planet1, distance))
+                    print(f"Travel connection from {planet1} to {planet2} of distance {distance} added")
+                    self.notify('connection_added', planet1=planet1, planet2=planet2, distance=distance)
+                    return
+            print('One or both planets does not exist, did you misspell anything?')
+
+    def set_planet_control(self, planet: str, factionControl: str):
+        with self.db:
+            row = self.db.execute('SELECT factionControl FROM planets WHERE name = ?', (planet,)).fetchone()
+            if row is None:
+                print('Planet does not exist, did you misspell anything?')
+                return
+            self.db.execute('UPDATE planets SET factionControl = ? WHERE name = ?', (factionControl, planet))
+            print(f"Planet {planet} is now controlled by {factionControl}")
+            self.notify('control_changed', planet=planet, faction=factionControl, previous=row[0])
+
+    def add_player(self, player: str, faction: str):
+        with self.db:
+            self.db.execute('INSERT OR IGNORE INTO players SELECT ?, ?, COALESCE(MAX(position), 0) + 1 FROM players',
+                            (player, faction))
+            self.db.execute('INSERT OR IGNORE INTO holdings SELECT name, ?, 0 FROM planets', (player,))
+        print(f"Player {player} added")
+        self.notify('player_added', player=player, faction=faction)
+
+    def add_ship_to_campaign(self, ship: str, points: int, resStorage: int, mass: int):
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO ship_classes VALUES (?, ?, ?, ?)', (ship, points, resStorage, mass))
+        print(f"Ship {ship} added to the campaign database")
+        self.notify('ship_registered', ship=ship, points=points, resStorage=resStorage, mass=mass)
+
+    def bulk_load(self, planets=(), connections=(), players=(), ships=()):
+        counts = {'planets': 0, 'connections': 0, 'players': 0, 'ships': 0, 'skipped': 0}
+        with self.db:
+            self.db.execute("INSERT OR IGNORE INTO meta VALUES ('turn', 0)")
+            for player, faction in players:
+                self.db.execute('INSERT OR IGNORE INTO players SELECT ?, ?, COALESCE(MAX(position), 0) + 1 '
+                                'FROM players', (player, faction))
+                self.db.execute('INSERT OR IGNORE INTO holdings SELECT name, ?, 0 FROM planets', (player,))
+                counts['players'] += 1
+            for planet, value, factionControl, factionAllegiance in planets:
+                self.reset_planet(planet)
+                self.db.execute('INSERT OR REPLACE INTO planets VALUES (?, ?, ?, ?)',
+                                (planet, value, factionControl, factionAllegiance))
+                self.db.execute('INSERT INTO holdings SELECT ?, name, 0 FROM players', (planet,))
+                counts['planets'] += 1
+            for planet1, planet2, distance in connections:
+                if self.planet_exists(planet1) and self.planet_exists(planet2):
+                    self.db.executemany('INSERT OR REPLACE INTO connections VALUES (?, ?, ?)',
+                                        ((planet1, planet2, distance), (planet2, planet1, distance)))
+                    counts['connections'] += 1
+                else:
+                    counts['skipped'] += 1
+            for ship, points, resStorage, mass in ships:
+                self.db.execute('INSERT OR REPLACE INTO ship_classes VALUES (?, ?, ?, ?)',
+                                (ship, points, resStorage, mass))
+                counts['ships'] += 1
+        self.notify('campaign_loaded')
+
+        print(f"Loaded {counts['planets']} planets, {counts['connections']} connections, "
+              f"{counts['players']} players and {counts['ships']} ships")
+        if counts['skipped']:
+            print(f"Skipped {counts['skipped']} connections to planets that do not exist")
+        return counts
+
+    def cheat_in_ship(self, planet: str, player: str, ship: str, amount: int):
+        with self.db:
+            if self.db.execute('SELECT 1 FROM ship_classes WHERE name = ?', (ship,)).fetchone() is None:
+                print(f"Ship {ship} not recognized, have you added the ship to this campaign?")
+            elif not self.on_planet(planet, player):
+                print(MISSING_FIELD)
+            else:
+                self.add_ships(planet, player, ship, amount)
+                print(f"Ship {ship} (x{amount}) spawned in on {planet} for {player}")
+                self.notify('ships_changed', planet=planet, player=player, ship=ship, amount=amount, reason='cheat')
+
+    def cheat_in_resources(self, planet: str, player: str, amount: int):
+        with self.db:
+            if not self.on_planet(planet, player):
+                print(MISSING_FIELD)
+                return
+            self.add_resources(planet, player, amount)
+        print(f"{amount} resources spawned in on {planet} for {player}")
+        self.notify('resources_changed', planet=planet, player=player, amount=amount, reason='cheat')
+
+    def void_resources(self, planet: str, player: str, amount: int):
+        with self.db:
+            if not self.on_planet(planet, player):
+                print(MISSING_FIELD)
+            elif self.get_resources(planet, player) >= amount:
+                self.add_resources(planet, player, -amount)
+                print(f"{amount} resources voided on {planet} for {player}")
+                self.notify('resources_changed', planet=planet, player=player, amount=-amount, reason='void')
+            else:
+                print(f'Not enough resources on {planet} ({player}) to be voided')
+
+    def make_ship(self, planet: str, player: str, ship: str, amount: int):
+        with self.db:
+            try:
+                canMakeShip = True
+                row = self.db.execute('SELECT factionControl FROM planets WHERE name = ?', (planet,)).fetchone()
+                if row is None:
+                    raise KeyError(planet)
+                planetFaction = row[0]
+                playerFaction = self.get_faction(player)
+
+                if playerFaction != planetFaction:
+                    canMakeShip = False
+                    print(f'Planet controlled by {planetFaction}, {player} can not built here')
+
+                if self.db.execute('SELECT 1 FROM ship_classes WHERE name = ?', (ship,)).fetchone() is None:
+                    canMakeShip = False
+                    print('Ship not recognized, have you added the ship to this campaign?')
+
+                cost = self.get_points(ship) * amount
+                if cost > self.get_resources(planet, player):
+                    canMakeShip = False
+                    print(f"Not enough resources on {planet} for production of {amount} {ship}'s")
+
+                if canMakeShip:
+                    queued = self.db.execute('SELECT amount FROM production WHERE planet = ? AND player = ? '
+                                             'AND ship = ?', (planet, player, ship)).fetchone()
+                    # resources are only deducted when the ship isn't queued yet, the same as Commands
+                    if queued is not None:
+                        self.db.execute('UPDATE production SET amount = amount + ? WHERE planet = ? AND player = ? '
+                                        'AND ship = ?', (amount, planet, player, ship))
+                        spent = 0
+                    else:
+                        self.db.execute('INSERT INTO production VALUES (?, ?, ?, ?)', (planet, player, ship, amount))
+                        self.add_resources(planet, player, -cost)
+                        spent = cost
+                    print(f"Ship {ship} (x{amount}) queued for production on {planet} for {player}")
+                    self.notify('production_queued', planet=planet, player=player, ship=ship, amount=amount,
+                                cost=cost, spent=spent)
+            except KeyError:
+                print(MISSING_FIELD)
+
+    def void_ship(self, planet: str, player: str, ship: str, amount: int):
+        with self.db:
+            held = self.get_ship_amount(planet, player, ship)
+            if held is None:
+                print(MISSING_FIELD)
+            elif amount > held:
+                print(f'Not enough ships on {planet} to void')
+            else:
+                self.remove_ships(planet, player, ship, amount)
+                print(f'Ship {ship} (x{amount}) voided on {planet} for {player}')
+                self.notify('ships_changed', planet=planet, player=player, ship=ship, amount=-amount, reason='void')
+
+    def scrap_ship(self, planet: str, player: str, ship: str, amount: int):
+        with self.db:
+            held = self.get_ship_amount(planet, player, ship)
+            if held is None:
+                print(MISSING_FIELD)
+            elif amount > held:
+                print(f'Not enough ships on {planet} to scrap')
+            else:
+                self.remove_ships(planet, player, ship, amount)
+                try:
+                    resourcesRecovered = amount * self.get_points(ship) * self.scrapRatio
+                except KeyError:
+                    print(MISSING_FIELD)
+                    return
+                self.add_resources(planet, player, resourcesRecovered)
+                print(f'Ship {ship} (x{amount}) scraped returning {resourcesRecovered} resources on {planet} for {player}')
+                self.notify('ships_changed', planet=planet, player=player, ship=ship, amount=-amount, reason='scrap')
+                self.notify('resources_changed', planet=planet, player=player, amount=resourcesRecovered,
+                            reason='scrap')
+
+    def make_fleet(self, planet: str, player: str, fleet: str, ships: dict):
+        with self.db:
+            if not self.on_planet(planet, player):
+                print(MISSING_FIELD)
+                return
+            canMakeFleet = True
+            for shipNameNeeded, shipAmountNeeded in ships.items():
+                held = self.get_ship_amount(planet, player, shipNameNeeded)
+                if held is None or held < shipAmountNeeded:
+                    canMakeFleet = False
+            if not canMakeFleet:
+                print(f'Not enough ships on {planet} to make fleet')
+
+            if self.fleet_id(planet, player, fleet) is not None:
+                canMakeFleet = False
+                print(f'Fleet {fleet} already exists, choose another fleet name')
+
+            if canMakeFleet:
+                fleetId = self.db.execute('INSERT INTO fleets (player, name, planet, resources) VALUES (?, ?, ?, 0)',
+                                          (player, fleet, planet)).lastrowid
+                for shipName, shipAmount in ships.items():
+                    self.db.execute('INSERT OR REPLACE INTO fleet_ships VALUES (?, ?, ?)',
+                                    (fleetId, shipName, shipAmount))
+                    self.db.execute('UPDATE planet_ships SET amount = amount - ? WHERE planet = ? AND player = ? '
+                                    'AND ship = ?', (shipAmount, planet, player, shipName))
+                    self.db.execute('DELETE FROM planet_ships WHERE planet = ? AND player = ? AND ship = ? '
+                                    'AND amount = 0', (planet, player, shipName))
+                print(f'Fleet {fleet} created on {planet} for {player}')
+                self.notify('fleet_created', planet=planet, player=player, fleet=fleet, ships=dict(ships))
+                for shipName, shipAmount in ships.items():
+                    self.notify('ships_changed', planet=planet, player=player, ship=shipName, amount=-shipAmount,
+                                reason='transfer')
+
+    def disband_fleet(self, planet: str, player: str, fleet: str):
+        with self.db:
+            if not self.on_planet(planet, player):
+                print('Some field (planet / player) does not exist, did you misspell anything?')
+                return
+            fleetId = self.fleet_id(planet, player, fleet)
+            if fleetId is None:
+                print('Fleet not recognized, did you misspell anything?')
+                return
+            fleetShips = self.fleet_ships(fleetId)
+            fleetResources = self.fleet_resources(fleetId)
+            for shipName, shipAmount in fleetShips.items():
+                self.add_ships(planet, player, shipName, shipAmount)
+            self.add_resources(planet, player, fleetResources)
+            self.delete_fleet(fleetId)
+            print(f'Fleet {fleet} disbanded on {planet}')
+            self.notify('fleet_disbanded', planet=planet, player=player, fleet=fleet)
+            for shipName, shipAmount in fleetShips.items():
+                self.notify('ships_changed', planet=planet, player=player, ship=shipName, amount=shipAmount,
+                            reason='transfer')
+            if fleetResources:
+                self.notify('resources_changed', planet=planet, player=player, amount=fleetResources,
+                            reason='transfer')
+
+    def fleet_stats(self, fleetId: int):
+        row = self.db.execute('SELECT COALESCE(SUM(c.points * f.amount), 0), COALESCE(SUM(c.resStorage * f.amount), 0), '
+                              'COALESCE(SUM(c.mass * f.amount), 0) FROM fleet_ships f '
+                              'JOIN ship_classes c ON c.name = f.ship WHERE f.fleet = ?', (fleetId,)).fetchone()
+        return {'fleetPoints': row[0], 'fleetStorage': row[1], 'fleetMass': row[2]}
+
+    def transfer_resources(self, planet: str, amount: int, playerFrom: str, locationFrom: str, playerTo: str,
+                           locationTo):
+        missing = 'Some field (planet / player) does not exist, did you misspell anything?'
+        with self.db:
+            if not self.planet_exists(planet):
+                print(missing)
+                return
+
+            def fleet(player, name):
+                # the fleets of a player that isn't on the planet can't be looked up, like a KeyError in Commands
+                if not self.on_planet(planet, player):
+                    raise KeyError(player)
+                return self.fleet_id(planet, player, name)
+
+            try:
+                fromId = None if locationFrom == planet else fleet(playerFrom, locationFrom)
+                toId = None if locationTo == planet else fleet(playerTo, locationTo)
+                if locationFrom != planet and fromId is None:
+                    print('Sending fleet or planet not recognized, did you misspell anything?')
+                    return
+                elif locationTo != planet and toId is None:
+                    print('Receiving fleet or planet not recognized, did you misspell anything?')
+                    return
+                elif locationFrom == planet and amount > self.get_resources(planet, playerFrom):
+                    print(f'Not enough resources on Planet {planet} for {playerFrom} to transfer')
+                    return
+                elif fromId is not None and amount > self.fleet_resources(fromId):
+                    print(f'Not enough resources in Fleet {locationFrom} for {playerFrom} to transfer')
+                    return
+                elif toId is not None and \
+                        amount > self.fleet_stats(toId)['fleetStorage'] - self.fleet_resources(toId):
+                    print(f'Not enough resource storage space on fleet {locationTo} for {playerFrom} to transfer')
+                    return
+                if not self.on_planet(planet, playerTo):
+                    raise KeyError(playerTo)
+            except KeyError:
+                print(missing)
+                return
+
+            if fromId is None:
+                self.add_resources(planet, playerFrom, -amount)
+            else:
+                self.db.execute('UPDATE fleets SET resources = resources - ? WHERE id = ?', (amount, fromId))
+            if toId is None:
+                self.add_resources(planet, playerTo, amount)
+            else:
+                self.db.execute('UPDATE fleets SET resources = resources + ? WHERE id = ?', (amount, toId))
+        print(f"Transfer of {amount} on {planet} from {locationFrom} ({playerFrom}) to {locationTo} ({playerTo}) completed")
+        self.notify('resources_changed', planet=planet, player=playerFrom, amount=-amount, reason='transfer',
+                    fleet=None if locationFrom == planet else locationFrom)
+        self.notify('resources_changed', planet=planet, player=playerTo, amount=amount, reason='transfer',
+                    fleet=None if locationTo == planet else locationTo)
+
+    def start_transit(self, fleetId: int, player: str, fleet: str, planetFrom: str, planetTo: str, transitType: str,
+                      costPerUnit):
+        # a transit replaces any other transit of the player with the same fleet name
+        previous = self.transit_row(player, fleet)
+        if previous is not None:
+            self.delete_fleet(previous[0])
+        self.db.execute('UPDATE fleets SET planet = NULL WHERE id = ?', (fleetId,))
+        self.db.execute('INSERT INTO transits SELECT ?, ?, ?, ?, ?, ?, 0, ?, COALESCE(MAX(position), 0) + 1 '
+                        'FROM transits', (fleetId, player, fleet, planetFrom, planetTo, transitType, costPerUnit))
+
+    def arrive(self, fleetId: int, player: str, fleet: str, planetTo: str):
+        # an arriving fleet replaces a fleet of the player with the same name already there
+        previous = self.fleet_id(planetTo, player, fleet)
+        if previous is not None and previous != fleetId:
+            self.delete_fleet(previous)
+        self.db.execute('DELETE FROM transits WHERE fleet = ?', (fleetId,))
+        self.db.execute('UPDATE fleets SET planet = ? WHERE id = ?', (planetTo, fleetId))
+
+    def prepare_transfer(self, player: str, fleet: str, planetFrom: str, planetTo: str, massRatio):
+        # shared checks of both transfers, returns the fleet id, cost per unit and travel distance or None
+        if not self.on_planet(planetFrom, player) or self.db.execute(
+                'SELECT 1 FROM players WHERE name = ?', (player,)).fetchone() is None:
+            print(MISSING_FIELD_FLEET)
+            return None
+        fleetId = self.fleet_id(planetFrom, player, fleet)
+        if fleetId is None:
+            print(MISSING_FIELD_FLEET)
+            return None
+        costPerUnit = self.fleet_stats(fleetId)['fleetMass'] / massRatio
+
+        travelDistance = self.get_distance(planetFrom, planetTo)
+        if travelDistance is None:
+            print(f'No connection between {planetFrom} and {planetTo} exists')
+            return None
+        if costPerUnit * travelDistance > self.fleet_resources(fleetId):
+            print(f"Not enough resources on fleet {fleet} to move from {planetFrom} to {planetTo}")
+            return None
+        return fleetId, costPerUnit, travelDistance
+
+    def hohmann_fleet_transfer(self, player: str, fleet: str, planetFrom: str, planetTo: str):
+        with self.db:
+            prepared = self.prepare_transfer(player, fleet, planetFrom, planetTo, self.hohmannMassRatio)
+            if prepared is None:
+                return
+            fleetId, costPerUnit, travelDistance = prepared
+            self.start_transit(fleetId, player, fleet, planetFrom, planetTo, 'hohmann', costPerUnit)
+        print(f'Fleet {fleet} ({player}) queued for transit from {planetFrom} to {planetTo}')
+        self.notify('fleet_departed', planet=planetFrom, player=player, fleet=fleet, planetTo=planetTo)
+
+    def brachistochrone_fleet_transfer(self, player: str, fleet: str, planetFrom: str, planetTo: str):
+        with self.db:
+            prepared = self.prepare_transfer(player, fleet, planetFrom, planetTo, self.brachistochroneMassRatio)
+            if prepared is None:
+                return
+            fleetId, costPerUnit, travelDistance = prepared
+            if travelDistance == 1:
+                travelCost = costPerUnit * travelDistance
+                self.db.execute('UPDATE fleets SET resources = resources - ? WHERE id = ?', (travelCost, fleetId))
+                if not self.on_planet(planetTo, player):
+                    print(MISSING_FIELD_FLEET)
+                    return
+                self.arrive(fleetId, player, fleet, planetTo)
+                print(f'Fleet {fleet} arrived on {planetTo} from {planetFrom}')
+            else:
+                self.start_transit(fleetId, player, fleet, planetFrom, planetTo, 'brachistochrone', costPerUnit)
+                print(f'Fleet {fleet} ({player}) queued for transit from {planetFrom} to {planetTo}')
+        if travelDistance == 1:
+            self.notify('resources_changed', planet=planetTo, player=player, amount=-travelCost, reason='fuel',
+                        fleet=fleet)
+        self.notify('fleet_departed', planet=planetFrom, player=player, fleet=fleet, planetTo=planetTo)
+        if travelDistance == 1:
+            self.notify('fleet_arrived', planet=planetTo, player=player, fleet=fleet, planetFrom=planetFrom)
+
+    def turn_fleet(self, player: str, fleet: str):
+        with self.db:
+            self.get_faction(player)
+            row = self.transit_row(player, fleet)
+            if row is None:
+                print('Some field (player / fleet) does not exist, did you misspell anything?')
+                return
+            fleetId, planetFrom, planetTo, transitType, progress, costPerUnit = row
+            travelDistance = self.get_distance(planetFrom, planetTo)
+            if self.fleet_resources(fleetId) > progress * costPerUnit:
+                progress = travelDistance - progress
+                planetFrom, planetTo = planetTo, planetFrom
+                self.db.execute('UPDATE transits SET progress = ?, planetFrom = ?, planetTo = ? WHERE fleet = ?',
+                                (progress, planetFrom, planetTo, fleetId))
+                if progress >= travelDistance:
+                    self.arrive(fleetId, player, fleet, planetTo)
+                    print(f"Fleet {fleet} ({player}) has canceled transit from {planetFrom}")
+                    self.notify('fleet_arrived', planet=planetTo, player=player, fleet=fleet, planetFrom=planetFrom)
+                else:
+                    print(f"Fleet {fleet} ({player}) queued for transit from {planetFrom} to {planetTo}")
+                    self.notify('fleet_turned', player=player, fleet=fleet, planetFrom=planetFrom, planetTo=planetTo)
+            else:
+                print(f'Not enough resources on fleet {fleet} to turn around')
+
+    def end_turn(self):
+        turn = self.get_turn()
+        print(f"--------------------turn {turn} ended--------------------")
+        print(f"Calculating end of turn {turn} and start of turn {turn + 1}")
+
+        with self.db:
+            # fleet travel, by player then by when the transit started like the shelve campaign
+            for fleetId, player, fleet, planetFrom, planetTo, transitType, progress, costPerUnit in self.db.execute(
+                    'SELECT t.fleet, t.player, t.name, t.planetFrom, t.planetTo, t.transitType, t.progress, '
+                    't.costPerUnit FROM transits t JOIN players p ON p.name = t.player '
+                    'ORDER BY p.position, t.position').fetchall():
+                distance = self.get_distance(planetFrom, planetTo)
+                fuel = 0
+                if transitType == 'hohmann':
+                    fuel, progress = costPerUnit, progress + 1
+                elif transitType == 'brachistochrone':
+                    fuel, progress = costPerUnit * 2, progress + 2
+                self.db.execute('UPDATE fleets SET resources = resources - ? WHERE id = ?', (fuel, fleetId))
+                self.db.execute('UPDATE transits SET progress = ? WHERE fleet = ?', (progress, fleetId))
+                if transitType in ('hohmann', 'brachistochrone'):
+                    self.notify('resources_changed', planet=None, player=player, amount=-fuel, reason='fuel',
+                                fleet=fleet)
+                self.notify('transit_progress', player=player, fleet=fleet, planetFrom=planetFrom, planetTo=planetTo,
+                            progress=progress, distance=distance)
+
+                if progress >= distance:
+                    self.arrive(fleetId, player, fleet, planetTo)
+                    print(f"Fleet {fleet} ({player}) has arrived at {planetTo} from {planetFrom}")
+                    self.notify('fleet_arrived', planet=planetTo, player=player, fleet=fleet, planetFrom=planetFrom)
+                else:
+                    print(f"Fleet {fleet} ({player}) is transfering to {planetTo} from {planetFrom}, "
+                          f"Progress: {progress}/{distance}")
+
+            # battles
+            for planet, factionsOnPlanet in self.find_battles().items():
+                print(f"Battle on {planet} between {', '.join(factionsOnPlanet)}")
+                for faction in factionsOnPlanet:
+                    print(f'Ships for {faction}:')
+                    for shipName, shipAmount in factionsOnPlanet[faction].items():
+                        print(f'{shipName} (x{shipAmount})')
+                self.notify('battle', planet=planet, factions=factionsOnPlanet)
+
+            self.db.execute("UPDATE meta SET value = value + 1 WHERE key = 'turn'")
+        self.notify('turn_ended', turn=turn + 1)
+
+    def find_battles(self):
+        """ Find every planet with ships or fleets of more than one faction on it
+        :return: dict of planet names to {faction: {ship: amount}} for each planet with a battle
+        """
+        factionsOnPlanets = {}
+        for planet, faction, ship, amount in self.db.execute(
+                'SELECT planet, faction, ship, SUM(amount) FROM ('
+                'SELECT s.planet, p.faction, s.ship, s.amount FROM planet_ships s JOIN players p ON p.name = s.player '
+                'UNION ALL '
+                'SELECT f.planet, p.faction, fs.ship, fs.amount FROM fleets f JOIN fleet_ships fs ON fs.fleet = f.id '
+                'JOIN players p ON p.name = f.player WHERE f.planet IS NOT NULL'
+                ') GROUP BY planet, faction, ship'):
+            factionsOnPlanets.setdefault(planet, {}).setdefault(faction, {})[ship] = amount
+        return {planet: factions for planet, factions in factionsOnPlanets.items() if len(factions) > 1}
+
+    def start_turn(self):
+        with self.db:
+            # income for every player of the faction controlling each planet
+            income = self.db.execute('SELECT h.planet, h.player, p.value FROM holdings h '
+                                     'JOIN planets p ON p.name = h.planet '
+                                     'JOIN players pl ON pl.name = h.player AND pl.faction = p.factionControl').fetchall()
+            self.db.execute('UPDATE holdings SET resources = resources + '
+                            '(SELECT p.value FROM planets p WHERE p.name = holdings.planet) '
+                            'WHERE EXISTS (SELECT 1 FROM planets p JOIN players pl ON pl.faction = p.factionControl '
+                            'WHERE p.name = holdings.planet AND pl.name = holdings.player)')
+
+            # finished production
+            produced = self.db.execute('SELECT planet, player, ship, amount FROM production').fetchall()
+            for planet, player, shipName, shipAmount in produced:
+                self.add_ships(planet, player, shipName, shipAmount)
+                print(f"Production of {shipName} (x{shipAmount}) on {planet} for {player} has finished")
+            self.db.execute('DELETE FROM production')
+            turn = self.get_turn()
+
+        for planet, player, value in income:
+            self.notify('resources_changed', planet=planet, player=player, amount=value, reason='income')
+        for planet, player, shipName, shipAmount in produced:
+            self.notify('ships_changed', planet=planet, player=player, ship=shipName, amount=shipAmount,
+                        reason='built')
+        print(f"--------------------start turn {turn}--------------------")
+        self.notify('turn_started', turn=turn)
+
+    # ad-hoc queries
+
+    def query(self, sql: str, params=()):
+        """ Run a read-only SQL query against the campaign without loading the galaxy into Python
+        :param sql: SELECT statement over the planets, connections, players, ship_classes, holdings,
+            planet_ships, fleets, fleet_ships, transits and production tables
+        :param params: parameters of the statement
+        :return: list of the column names followed by the result rows
+        """
+        self.db.commit()
+        reader = sqlite3.connect(f'file:{self.file}?mode=ro', uri=True)
+        try:
+            cursor = reader.execute(sql, params)
+            columns = tuple(column[0] for column in cursor.description or ())
+            return [columns] + cursor.fetchall()
+        finally:
+            reader.close()
+
+    def fleets_with_resources(self, faction: str, minResources=0):
+        """ Find the fleets of a faction holding more than an amount of resources, on planets or in transit
+        :param faction: faction of the fleets
+        :param minResources: fleets need more resources than this
+        :return: list of the column names followed by (player, fleet, planet, resources) rows
+        """
+        return self.query('SELECT f.player, f.name, COALESCE(f.planet, t.planetFrom || \' -> \' || t.planetTo) AS location, '
+                          'f.resources FROM fleets f JOIN players p ON p.name = f.player '
+                          'LEFT JOIN transits t ON t.fleet = f.id '
+                          'WHERE p.faction = ? AND f.resources > ? ORDER BY f.resources DESC', (faction, minResources))
+
+
+def open_commands(file: str, readOnly: bool = False):
+    """ Open a campaign with the backend matching its file name, saves ending in .sqlite use SQLiteCommands
+    :param file: path of the save
+    :param readOnly: open the save for queries only
+    :return: Commands or SQLiteCommands
+    """
+    if file.endswith('.sqlite'):
+        return SQLiteCommands(file, readOnly)
+    return Commands(file, readOnly)
@@ -0,0 +1,148 @@
+import gzip
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+from CampaignCommands import Commands
+from CampaignReports import build_player_reports
+
+
+def build_views(snapshot: dict):
+    """ Build every JSON view served to map viewers from a campaign snapshot
+    :param snapshot: campaign snapshot from Commands.snapshot
+    :return: dict of paths to the object served there
+    """
+    planets = snapshot['planets']
+    views = {'/turn': {'turn': snapshot['turn']}}
+
+    # the map itself, without what is on each planet
+    views['/planets'] = {planet: {key: localPlanet[key] for key in
+                                  ('value', 'factionControl', 'factionAllegiance', 'connections')}
+                         for planet, localPlanet in planets.items()}
+    for planet, localPlanet in planets.items():
+        views[f'/planets/{planet}'] = localPlanet
+
+    views['/fleets'] = [{'player': player, 'fleet': fleet, 'planet': planet, 'resources': localFleet['resources'],
+                         'ships': localFleet['ships']}
+                        for planet, localPlanet in planets.items()
+                        for player, playerFleets in localPlanet['fleets'].items()
+                        for fleet, localFleet in playerFleets.items()]
+
+    views['/transits'] = [{'player': player, 'fleet': fleet, 'planetFrom': transit['planetFrom'],
+                           'planetTo': transit['planetTo'], 'transitType': transit['transitType'],
+                           'progress': transit['progress'], 'resources': transit['fleet']['resources'],
+                           'ships': transit['fleet']['ships']}
+                          for player, localPlayer in snapshot['players'].items()
+                          for fleet, transit in localPlayer['transits'].items()]
+
+    reports = build_player_reports(snapshot)
+    views['/players'] = {player: {'faction': report['faction'], 'income': report['income'],
+                                  'planetsHeld': len(report['holdings']), 'transits': len(report['transits']),
+                                  'battles': len(report['battles'])}
+                         for player, report in reports.items()}
+    for player, report in reports.items():
+        views[f'/players/{player}'] = report
+
+    views['/'] = sorted(views)
+    return views
+
+
+def prepare_response(view):
+    # responses are encoded, compressed and tagged once per snapshot, not once per request
+    body = json.dumps(view, sort_keys=True).encode()
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    return etag, body, gzip.compress(body)
+
+
+class SnapshotHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        responses = self.server.responses
+        path = unquote(urlsplit(self.path).path).rstrip('/') or '/'
+        if path not in responses:
+            body = json.dumps({'error': f'{path} not found'}).encode()
+            self.send_response(404)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        etag, body, compressed = responses[path]
+        if etag in self.headers.get('If-None-Match', ''):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = compressed
+            self.send_response(200)
+            self.send_header('Content-Encoding', 'gzip')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # keep the GM's console quiet
+        pass
+
+
+class SnapshotServer:
+    """ Serves JSON views of the campaign to map viewers from an immutable snapshot taken after every start_turn.
+    Requests never touch the live campaign, and the views are rebuilt in a background thread.
+    """
+
+    def __init__(self, campaign: Commands, port: int = 8080, host: str = '127.0.0.1'):
+        self.campaign = campaign
+        self.httpServer = ThreadingHTTPServer((host, port), SnapshotHandler)
+        self.httpServer.daemon_threads = True
+        self.httpServer.responses = {}
+        # snapshots are numbered so a slow build never replaces a newer snapshot
+        self.lock = threading.Lock()
+        self.taken = 0
+        self.served = 0
+        self.publish()
+        campaign.add_listener(self.handle_event)
+        self.thread = threading.Thread(target=self.httpServer.serve_forever, daemon=True)
+        self.thread.start()
+        print(f'Serving campaign snapshots on http://{host}:{self.httpServer.server_address[1]}/')
+
+    def handle_event(self, event: str, details: dict):
+        if event in ('turn_started', 'campaign_loaded'):
+            self.publish()
+
+    def publish(self):
+        """ Take a snapshot of the campaign now and start serving it once its views are built
+        :return: None
+        """
+        # the snapshot has to be taken right away, building the responses from it can happen in the background
+        snapshot = self.campaign.snapshot()
+        if 'turn' not in snapshot:
+            return
+        self.taken += 1
+        threading.Thread(target=self.build, args=(snapshot, self.taken), daemon=True).start()
+
+    def build(self, snapshot: dict, number: int):
+        responses = {path: prepare_response(view) for path, view in build_views(snapshot).items()}
+        with self.lock:
+            if number > self.served:
+                # swapping the whole dict means requests see either the old snapshot or the new one, never a mix
+                self.httpServer.responses = responses
+                self.served = number
+
+    def close(self):
+        """ Stop serving and stop following the campaign
+        :return: None
+        """
+        self.campaign.remove_listener(self.handle_event)
+        self.httpServer.shutdown()
+        self.httpServer.server_close()
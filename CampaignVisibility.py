@@ -0,0 +1,149 @@
+from CampaignCommands import Commands
+
+# events that can change whether a player holds ships or fleets on a planet
+HOLDING_EVENTS = ('ships_changed', 'fleet_created', 'fleet_disbanded', 'fleet_departed', 'fleet_arrived')
+
+
+class VisibilityCache:
+    """ Keeps the set of planets each player can see (planets they hold ships or fleets on, and the planets
+    connected to those) up to date from the change notifications of a campaign
+    """
+
+    def __init__(self, campaign: Commands):
+        self.campaign = campaign
+        # player -> set of planets the player has ships or fleets on
+        self.holdings = {}
+        # player -> {planet: number of held planets that planet is on or next to}, a planet is visible while > 0
+        self.visibleCounts = {}
+        # planet -> set of connected planets, mirrored so repeated connections aren't counted twice
+        self.neighbours = {}
+        self.rebuild()
+        campaign.add_listener(self.handle_event)
+
+    def rebuild(self):
+        """ Work out the visibility of every player from scratch
+        :return: None
+        """
+        planets = self.campaign.campaign.get('planets', {})
+        players = self.campaign.campaign.get('players', {})
+
+        self.neighbours = {planet: set(localPlanet['connections']) for planet, localPlanet in planets.items()}
+        self.holdings = {player: set() for player in players}
+        self.visibleCounts = {player: {} for player in players}
+        for planet in planets:
+            for player in players:
+                self.update_holding(player, planet)
+
+    def handle_event(self, event: str, details: dict):
+        """ Update the visibility from a campaign change notification
+        :param event: name of the event
+        :param details: dict of the event details
+        :return: None
+        """
+        if event in HOLDING_EVENTS:
+            self.update_holding(details['player'], details['planet'])
+        elif event == 'connection_added':
+            self.add_connection(details['planet1'], details['planet2'])
+        elif event == 'player_added':
+            self.holdings.setdefault(details['player'], set())
+            self.visibleCounts.setdefault(details['player'], {})
+        elif event == 'planet_added':
+            # re-adding a planet wipes its connections and holdings, which is rare enough to just rebuild
+            if details['planet'] in self.neighbours:
+                self.rebuild()
+            else:
+                self.neighbours[details['planet']] = set()
+        elif event == 'campaign_loaded':
+            self.rebuild()
+
+    def close(self):
+        """ Stop following the campaign
+        :return: None
+        """
+        self.campaign.remove_listener(self.handle_event)
+
+    def update_holding(self, player: str, planet: str):
+        """ Check if a player still holds ships or fleets on a planet and update what they can see if that changed
+        :param player: name of the player
+        :param planet: name of the planet
+        :return: None
+        """
+        localPlanet = self.campaign.campaign['planets'][planet]
+        holds = any(amount > 0 for amount in localPlanet['ships'].get(player, {}).values()) or \
+            bool(localPlanet['fleets'].get(player))
+
+        playerHoldings = self.holdings.setdefault(player, set())
+        if holds and planet not in playerHoldings:
+            playerHoldings.add(planet)
+            self.change_counts(player, planet, 1)
+        elif not holds and planet in playerHoldings:
+            playerHoldings.remove(planet)
+            self.change_counts(player, planet, -1)
+
+    def add_connection(self, planet1: str, planet2: str):
+        """ Let the holders of either planet see the other
+        :param planet1: name of the first planet
+        :param planet2: name of the second planet
+        :return: None
+        """
+        if planet2 in self.neighbours.setdefault(planet1, set()):
+            return
+        self.neighbours[planet1].add(planet2)
+        self.neighbours.setdefault(planet2, set()).add(planet1)
+
+        for player, playerHoldings in self.holdings.items():
+            if planet1 in playerHoldings:
+                self.change_count(player, planet2, 1)
+            if planet2 in playerHoldings:
+                self.change_count(player, planet1, 1)
+
+    def change_counts(self, player: str, planet: str, change: int):
+        # a held planet makes itself and every planet connected to it visible
+        self.change_count(player, planet, change)
+        for neighbour in self.neighbours.get(planet, ()):
+            self.change_count(player, neighbour, change)
+
+    def change_count(self, player: str, planet: str, change: int):
+        counts = self.visibleCounts.setdefault(player, {})
+        count = counts.get(planet, 0) + change
+        if count > 0:
+            counts[planet] = count
+        else:
+            counts.pop(planet, None)
+
+    def visible_planets(self, player: str):
+        """ Get the planets a player can currently see
+        :param player: name of the player
+        :return: set of planet names
+        """
+        return set(self.visibleCounts.get(player, {}))
+
+    def can_see(self, player: str, planet: str):
+        """ Test if a player can currently see a planet
+        :param player: name of the player
+        :param planet: name of the planet
+        :return: bool
+        """
+        return planet in self.visibleCounts.get(player, {})
+
+    def get_details(self, player: str, arg: str):
+        """ Get the details of a planet, player or ship as seen by a player
+        Planets out of sight only show what is on the map (value, factions and connections), and other players
+        only show their faction.
+        :param player: name of the player looking
+        :param arg: name of the planet, player or ship
+        :return: filtered dict, or None if the field does not exist
+        """
+        campaign = self.campaign.campaign
+        if arg in campaign['planets']:
+            localPlanet = campaign['planets'][arg]
+            if self.can_see(player, arg):
+                return localPlanet
+            return {key: localPlanet[key] for key in ('value', 'factionControl', 'factionAllegiance', 'connections')}
+        elif arg in campaign['players']:
+            if arg == player:
+                return campaign['players'][arg]
+            return {'faction': campaign['players'][arg]['faction']}
+        elif arg in campaign['ships']:
+            return campaign['ships'][arg]
+        return None